@@ -0,0 +1,103 @@
+"""
+Measure the startup time of the exporter: the import time of its modules, as
+reported by `python -X importtime`, and the wall time of a complete `--once`
+run replaying the test capture. Pass `--source` to measure another checkout,
+e.g. to compare against an earlier commit:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/startup.py --source /tmp/before
+"""
+import argparse
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+CAPTURE = ROOT / 'tests' / 'fixtures' / 'zpool.capture'
+ONCE = (
+    'import sys; '
+    'from prometheus_zpool_iostat_exporter.main import main; '
+    'sys.argv[0] = "prometheus_zpool_iostat_exporter"; '
+    'main()')
+
+
+def run(source: pathlib.Path, args: list[str]) -> subprocess.CompletedProcess:
+    # With -c, the working directory precedes PYTHONPATH on sys.path
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=source, env=os.environ | {'PYTHONPATH': str(source)},
+        capture_output=True, text=True, check=True)
+
+
+def import_time(source: pathlib.Path, module: str, preload: str) -> float:
+    """
+    Cumulative import time of a module in seconds. Modules in `preload` are
+    imported first, such that their import time is not included.
+    """
+    result = run(source, [
+        '-X', 'importtime', '-c', f'import {preload}; import {module}'])
+
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, name = line.split('|')
+
+        if name.strip() == module:
+            return int(cumulative) / 1e6
+
+    raise ValueError(f'{module} was not imported')
+
+
+def wall_time(source: pathlib.Path, args: list[str]) -> float:
+    start = time.perf_counter()
+    run(source, args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--source',
+        dest='source',
+        required=False,
+        type=pathlib.Path,
+        default=ROOT,
+        help='Checkout of the exporter to measure (default = this checkout)')
+    parser.add_argument(
+        '--runs',
+        dest='runs',
+        required=False,
+        type=int,
+        default=20,
+        help='Number of runs per measurement (default = 20)')
+    args = parser.parse_args()
+
+    benchmarks = {
+        'import iostat': lambda: import_time(
+            args.source, 'prometheus_zpool_iostat_exporter.iostat',
+            'prometheus_client.core, prometheus_zpool_iostat_exporter'),
+        'import exporter': lambda: import_time(
+            args.source, 'prometheus_zpool_iostat_exporter.exporter',
+            'prometheus_zpool_iostat_exporter'),
+        'python -c pass': lambda: wall_time(args.source, ['-c', 'pass']),
+        '--once -lqwr --replay': lambda: wall_time(args.source, [
+            '-c', ONCE, '--once', '-lqwr', '--replay', str(CAPTURE)]),
+    }
+
+    print(f'{"benchmark":<24}{"median [ms]":>12}{"min [ms]":>12}')
+
+    for name, benchmark in benchmarks.items():
+        try:
+            times = [benchmark() for _ in range(args.runs)]
+        except subprocess.CalledProcessError:
+            print(f'{name:<24}{"n/a":>12}{"n/a":>12}')
+            continue
+
+        print(f'{name:<24}{statistics.median(times) * 1e3:>12.1f}'
+              f'{min(times) * 1e3:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
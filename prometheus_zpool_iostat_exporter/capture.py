@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Union
+
+
+class CommandRecorder:
+    """
+    Record every command run by the exporter along with its output and
+    duration. Captures are appended to the capture file as one compact JSON
+    object per line, so that a recording can be extended across restarts.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self,
+               command: list[str],
+               stdout: str,
+               stderr: str,
+               duration: float,
+               error: str = None):
+        capture = {
+            'command': command,
+            'stdout': stdout,
+            'stderr': stderr,
+            'duration': round(duration, 6)}
+
+        if error is not None:
+            capture['error'] = error
+
+        line = json.dumps(capture, separators=(',', ':')) + '\n'
+
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+class CommandReplay:
+    """
+    Serve commands from a capture file written by `CommandRecorder`. Each
+    command cycles through its captures in the recorded order. If `timing`
+    is True, each capture takes as long as the command took when it was
+    recorded.
+    """
+    def __init__(self, path: str, timing: bool = True):
+        self.path = path
+        self.timing = timing
+        self._captures = defaultdict(list)
+        self._position = defaultdict(int)
+        self._lock = threading.Lock()
+
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+
+                capture = json.loads(line)
+                self._captures[tuple(capture['command'])].append(capture)
+
+    def replay(self, command: list[str]) -> Union[dict, None]:
+        key = tuple(command)
+        captures = self._captures.get(key)
+
+        if not captures:
+            return
+
+        with self._lock:
+            position = self._position[key]
+            self._position[key] = (position + 1) % len(captures)
+
+        capture = captures[position]
+
+        if self.timing:
+            time.sleep(capture['duration'])
+
+        return capture
@@ -1,6 +1,10 @@
+import contextlib
 import itertools
+import re
 import subprocess
-from typing import Type, Union
+import threading
+import time
+from typing import TYPE_CHECKING, Type, Union
 
 from prometheus_client import Summary
 from prometheus_client.core import (
@@ -8,10 +12,95 @@ from prometheus_client.core import (
 
 from . import iostat, logger, EXPORTER_PREFIX
 
-# Measure collection time
-REQUEST_TIME = Summary(
-    f'{EXPORTER_PREFIX}_collector_collect_seconds',
-    'Time spent to collect metrics from the NTP server')
+if TYPE_CHECKING:
+    from .capture import CommandRecorder, CommandReplay
+    from .snapshot import SnapshotWriter
+
+# Column layouts of zpool commands, keyed by command (excluding pools). Each
+#   layout holds the expected row width and the column index of every metric,
+#   or is None if the header was not recognized.
+LAYOUTS: dict[tuple[str, ...],
+              Union[tuple[int, dict[Type[iostat.Metric], int]], None]] = {}
+
+# Scrapes since the layout of a command was last detected again because its
+#   rows did not match, keyed like LAYOUTS. While rows keep mismatching, the
+#   layout is detected again at most once per REPROBE_SCRAPES scrapes.
+MISMATCHED: dict[tuple[str, ...], int] = {}
+REPROBE_SCRAPES = 10
+
+# Metrics per group, where each group can be selected per scrape
+GROUPS: dict[str, list[Type[iostat.Metric]]] = {
+    'list': [
+        iostat.Size,
+        iostat.Alloc,
+        iostat.Free,
+        iostat.CkPoint,
+        iostat.ExpandSz,
+        iostat.Frag,
+        iostat.Cap,
+        iostat.Dedup,
+        iostat.Health],
+    'iostat': [
+        iostat.CapacityAlloc,
+        iostat.CapacityFree,
+        iostat.OperationsRead,
+        iostat.OperationsWrite,
+        iostat.BandwidthRead,
+        iostat.BandwidthWrite],
+    'latency': [
+        iostat.TotalWaitRead,
+        iostat.TotalWaitWrite,
+        iostat.DiskWaitRead,
+        iostat.DiskWaitWrite,
+        iostat.SyncQWaitRead,
+        iostat.SyncQWaitWrite,
+        iostat.AsyncQWaitRead,
+        iostat.AsyncQWaitWrite,
+        iostat.Scrub,
+        iostat.Trim],
+    'queue': [
+        iostat.SyncQReadPend,
+        iostat.SyncQReadActiv,
+        iostat.SyncQWritePend,
+        iostat.SyncQWriteActiv,
+        iostat.ASyncQReadPend,
+        iostat.ASyncQReadActiv,
+        iostat.ASyncQWritePend,
+        iostat.ASyncQWriteActiv,
+        iostat.ScrubQPending,
+        iostat.ScrubQActiv,
+        iostat.TrimQPend,
+        iostat.TrimQActiv],
+    'latency_hist': [
+        iostat.LatencyTotalWaitRead,
+        iostat.LatencyTotalWaitWrite,
+        iostat.LatencyDiskWaitRead,
+        iostat.LatencyDiskWaitWrite,
+        iostat.LatencySyncQWaitRead,
+        iostat.LatencySyncQWaitWrite,
+        iostat.LatencyAsyncQWaitRead,
+        iostat.LatencyAsyncQWaitWrite,
+        iostat.LatencyScrub,
+        iostat.LatencyTrim],
+    'request_size_hist': [
+        iostat.RequestSizeSyncReadIndividual,
+        iostat.RequestSizeSyncReadAggregate,
+        iostat.RequestSizeSyncWriteIndividual,
+        iostat.RequestSizeSyncWriteAggregate,
+        iostat.RequestSizeASyncReadIndividual,
+        iostat.RequestSizeASyncReadAggregate,
+        iostat.RequestSizeASyncWriteIndividual,
+        iostat.RequestSizeASyncWriteAggregate,
+        iostat.RequestSizeScrubIndividual,
+        iostat.RequestSizeScrubAggregate,
+        iostat.RequestSizeTrimIndividual,
+        iostat.RequestSizeTrimAggregate]}
+
+
+def gather_shard(pools: list[str], groups: list[str]
+                 ) -> dict[Type[iostat.Metric], list[iostat.Metric]]:
+    """Gather the metrics of a subset of pools in a worker process"""
+    return ZPoolIOStatExporter(pools=pools).run(groups)
 
 
 class ZPoolIOStatExporter:
@@ -20,42 +109,208 @@ class ZPoolIOStatExporter:
                  latency: bool = False,
                  queue: bool = False,
                  iowait: bool = False,
-                 request_size: bool = False):
+                 request_size: bool = False,
+                 max_series: int = None,
+                 sparse_histograms: bool = False,
+                 recorder: 'CommandRecorder' = None,
+                 replay: 'CommandReplay' = None,
+                 request_time: Summary = None,
+                 snapshot_writer: 'SnapshotWriter' = None,
+                 workers: int = 1,
+                 cache_ttl: float = 0):
         self.pools = pools if pools is not None else []
         self.latency = latency
         self.queue = queue
         self.iowait = iowait
         self.request_size = request_size
-
-    @staticmethod
-    def run_cmd(command: list[str]) -> Union[str, None]:
-        try:
-            process = subprocess.Popen(
-                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, stderr = process.communicate()
-        except Exception as exc:
-            logger.error(f"'{' '.join(command)}' failed: {exc}")
+        self.max_series = max_series
+        self.sparse_histograms = sparse_histograms
+        self.recorder = recorder
+        self.replay = replay
+        self.request_time = request_time
+        self.snapshot_writer = snapshot_writer
+        self.workers = workers
+        self.cache_ttl = cache_ttl
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._cache = {}
+        self._locks = {group: threading.Lock() for group in GROUPS}
+        self._selection = threading.local()
+
+    def run_cmd(self, command: list[str]) -> Union[str, None]:
+        if self.replay is not None:
+            captured = self.replay.replay(command)
+
+            if captured is None:
+                logger.error(
+                    f"'{' '.join(command)}' failed: no capture in "
+                    f"{self.replay.path}")
+                return
+
+            stdout, stderr = captured['stdout'], captured['stderr']
+            error = captured.get('error')
+        else:
+            start = time.monotonic()
+
+            try:
+                process = subprocess.Popen(
+                    command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                stdout, stderr = process.communicate()
+                stdout, stderr = stdout.decode('utf-8'), stderr.decode('utf-8')
+                error = None
+            except Exception as exc:
+                stdout, stderr, error = '', '', str(exc)
+
+            if self.recorder is not None:
+                self.recorder.record(
+                    command, stdout, stderr, time.monotonic() - start, error)
+
+        if error is not None:
+            logger.error(f"'{' '.join(command)}' failed: {error}")
             return
 
         if stderr:
             # Something is wrong with the command that won't resolve itself
             #   over time.
             raise Exception(
-                f"'{' '.join(command)}' failed: "
-                f"{stderr.decode('utf-8').strip()}")
+                f"'{' '.join(command)}' failed: {stderr.strip()}")
 
-        return stdout.decode('utf-8').strip()
+        # Leading spaces are kept, as they align the headers of zpool output
+        return stdout.lstrip('\n').rstrip()
+
+    @staticmethod
+    def parse_header(data: str) -> list[str]:
+        """
+        Parse column names from the header of unscripted (non -H) output.
+
+        `zpool list` prints a single line of column names. `zpool iostat`
+        prints a line of column groups above the column names, followed by a
+        line of dashes marking the width of each column. Such columns are
+        named after their group and name, e.g. 'operations_read'.
+        """
+        lines = data.split('\n')
+        dashes = next(
+            (i for i, line in enumerate(lines) if line.startswith('-')), None)
+
+        if dashes is None:
+            return lines[0].lower().split()
+
+        names = lines[dashes-1].split()
+        spans = [m.span() for m in re.finditer(r'-+', lines[dashes])]
+        groups = [
+            (m.group(), m.span())
+            for m in re.finditer(r'\S+', '\n'.join(lines[:dashes-1]))]
+
+        if len(names) != len(spans):
+            return []
+
+        columns = [names[0]]
+
+        for name, (start, end) in zip(names[1:], spans[1:]):
+            # Groups are centered above their columns, so assign each column
+            #   to the group it overlaps the most.
+            overlap = [
+                (min(end, g_end) - max(start, g_start), group)
+                for group, (g_start, g_end) in groups]
+            size, group = max(overlap, default=(0, None))
+            columns.append(f'{group}_{name}' if size > 0 else name)
+
+        return columns
+
+    def layout(self,
+               command: list[str],
+               metrics: list[Type[iostat.Metric]]
+               ) -> Union[tuple[int, dict[Type[iostat.Metric], int]], None]:
+        """
+        Detect the column layout of a scripted zpool command by running it
+        once without -H. The layout is cached until the output no longer
+        matches it, e.g. after zpool was upgraded. As rows may keep
+        mismatching with a newly detected layout, e.g. for a pool in an
+        unexpected state, detection is then only repeated every
+        `REPROBE_SCRAPES` scrapes.
+        """
+        key = tuple(c for c in command if c not in self.pools)
+
+        if key not in LAYOUTS:
+            header = self.run_cmd([c for c in command if c != '-H'])
+            columns = self.parse_header(header) if header else []
+
+            # Without a recognizable header, e.g. when replaying a capture
+            #   recorded without it, fall back to the column order of
+            #   `metrics`. This is cached as well, so the header is not
+            #   requested again until rows no longer match.
+            if not any(m.column in columns for m in metrics):
+                LAYOUTS[key] = None
+                return
+
+            for m in metrics:
+                if m.column not in columns:
+                    logger.warning(
+                        f"Column '{m.column}' of {m.name} not found in "
+                        f"'{' '.join(key)}'")
+
+            LAYOUTS[key] = (
+                len(columns),
+                {m: columns.index(m.column) for m in metrics
+                 if m.column in columns})
+
+        return LAYOUTS[key]
 
     @staticmethod
     def parse_table(data: str,
-                    metrics: list[Type[iostat.Metric]]
-                    ) -> dict[Type[iostat.Metric], list[iostat.Metric]]:
+                    metrics: list[Type[iostat.Metric]],
+                    layout: tuple[int, dict[Type[iostat.Metric], int]] = None
+                    ) -> tuple[dict[Type[iostat.Metric], list[iostat.Metric]],
+                               int]:
+        """
+        Parse tab-separated rows into metrics, returning the metrics along
+        with the number of rows that did not match the column layout. Without
+        a layout, columns are assumed to follow the order of `metrics`.
+        """
         if not data:
-            return {}
+            return {}, 0
+
+        if layout is None:
+            layout = (None, {m: i+1 for i, m in enumerate(metrics)})
 
+        width, columns = layout
         data = [pool.split('\t') for pool in data.split('\n')]
-        return {m: [m(d[0], d[i+1]) for d in data]
-                for i, m in enumerate(metrics)}
+        rows = [
+            d for d in data
+            if len(d) == width
+            or width is None and len(d) > len(metrics)]
+
+        return ({m: [m(d[0], d[i]) for d in rows] for m, i in columns.items()},
+                len(data) - len(rows))
+
+    def table(self,
+              command: list[str],
+              metrics: list[Type[iostat.Metric]]
+              ) -> dict[Type[iostat.Metric], list[iostat.Metric]]:
+        """
+        Run a scripted zpool command and parse its output according to its
+        detected column layout. The number of rows not matching the layout is
+        included as a metric.
+        """
+        key = tuple(c for c in command if c not in self.pools)
+        output = self.run_cmd(command)
+
+        # Without output, e.g. when no pools are imported, there is nothing
+        #   to detect the layout for.
+        layout = self.layout(command, metrics) if output else None
+        data, mismatches = self.parse_table(output, metrics, layout)
+
+        if not mismatches:
+            MISMATCHED.pop(key, None)
+        elif key not in MISMATCHED or \
+                MISMATCHED[key] + 1 >= REPROBE_SCRAPES:
+            LAYOUTS.pop(key, None)
+            MISMATCHED[key] = 0
+        else:
+            MISMATCHED[key] += 1
+
+        return data | {iostat.ParseMismatch: [
+            iostat.ParseMismatch(' '.join(key), mismatches)]}
 
     @staticmethod
     def parse_hist(data: str,
@@ -83,6 +338,11 @@ class ZPoolIOStatExporter:
 
         return histograms
 
+    def list_pools(self) -> list[str]:
+        """List the names of all imported pools"""
+        pools = self.run_cmd(['zpool', 'list', '-H', '-o', 'name'])
+        return pools.split('\n') if pools else []
+
     def zlist(self) -> dict[Type[iostat.Metric], list[iostat.Metric]]:
         """
         Lists all pools along with a health status and space usage.
@@ -91,17 +351,8 @@ class ZPoolIOStatExporter:
         given property is 'altroot', which is ignored.
         """
         command = ['zpool', 'list', '-H', '-p', *self.pools]
-        metrics = [
-            iostat.Size,
-            iostat.Alloc,
-            iostat.Free,
-            iostat.CkPoint,
-            iostat.ExpandSz,
-            iostat.Frag,
-            iostat.Cap,
-            iostat.Dedup,
-            iostat.Health]
-        return self.parse_table(self.run_cmd(command), metrics)
+        metrics = GROUPS['list']
+        return self.table(command, metrics)
 
     def ziostat(self,
                 latency: bool = False,
@@ -116,45 +367,17 @@ class ZPoolIOStatExporter:
         statistics.
         """
         command = ['zpool', 'iostat', '-H', '-p', *self.pools]
-        metrics = [
-            iostat.CapacityAlloc,
-            iostat.CapacityFree,
-            iostat.OperationsRead,
-            iostat.OperationsWrite,
-            iostat.BandwidthRead,
-            iostat.BandwidthWrite]
+        metrics = [*GROUPS['iostat']]
 
         if latency:
             command.append('-l')
-            metrics.extend([
-                iostat.TotalWaitRead,
-                iostat.TotalWaitWrite,
-                iostat.DiskWaitRead,
-                iostat.DiskWaitWrite,
-                iostat.SyncQWaitRead,
-                iostat.SyncQWaitWrite,
-                iostat.AsyncQWaitRead,
-                iostat.AsyncQWaitWrite,
-                iostat.Scrub,
-                iostat.Trim])
+            metrics.extend(GROUPS['latency'])
 
         if queue:
             command.append('-q')
-            metrics.extend([
-                iostat.SyncQReadPend,
-                iostat.SyncQReadActiv,
-                iostat.SyncQWritePend,
-                iostat.SyncQWriteActiv,
-                iostat.ASyncQReadPend,
-                iostat.ASyncQReadActiv,
-                iostat.ASyncQWritePend,
-                iostat.ASyncQWriteActiv,
-                iostat.ScrubQPending,
-                iostat.ScrubQActiv,
-                iostat.TrimQPend,
-                iostat.TrimQActiv])
-
-        return self.parse_table(self.run_cmd(command), metrics)
+            metrics.extend(GROUPS['queue'])
+
+        return self.table(command, metrics)
 
     def zhist_wait(self) -> dict[Type[iostat.HistogramMetric],
                                  list[iostat.HistogramMetric]]:
@@ -165,17 +388,7 @@ class ZPoolIOStatExporter:
         -H: scripted mode.
         """
         command = ['zpool', 'iostat', '-wpH', *self.pools]
-        metrics = [
-            iostat.LatencyTotalWaitRead,
-            iostat.LatencyTotalWaitWrite,
-            iostat.LatencyDiskWaitRead,
-            iostat.LatencyDiskWaitWrite,
-            iostat.LatencySyncQWaitRead,
-            iostat.LatencySyncQWaitWrite,
-            iostat.LatencyAsyncQWaitRead,
-            iostat.LatencyAsyncQWaitWrite,
-            iostat.LatencyScrub,
-            iostat.LatencyTrim]
+        metrics = GROUPS['latency_hist']
 
         return self.parse_hist(self.run_cmd(command), metrics)
 
@@ -188,43 +401,268 @@ class ZPoolIOStatExporter:
         numbers in (exact) values; -H: scripted mode.
         """
         command = ['zpool', 'iostat', '-rpH', *self.pools]
-        metrics = [
-            iostat.RequestSizeSyncReadIndividual,
-            iostat.RequestSizeSyncReadAggregate,
-            iostat.RequestSizeSyncWriteIndividual,
-            iostat.RequestSizeSyncWriteAggregate,
-            iostat.RequestSizeASyncReadIndividual,
-            iostat.RequestSizeASyncReadAggregate,
-            iostat.RequestSizeASyncWriteIndividual,
-            iostat.RequestSizeASyncWriteAggregate,
-            iostat.RequestSizeScrubIndividual,
-            iostat.RequestSizeScrubAggregate,
-            iostat.RequestSizeTrimIndividual,
-            iostat.RequestSizeTrimAggregate]
+        metrics = GROUPS['request_size_hist']
 
         return self.parse_hist(self.run_cmd(command), metrics)
 
-    @REQUEST_TIME.time()
-    def collect(self):
-        data = self.zlist() | self.ziostat(self.latency, self.queue)
+    @property
+    def groups(self) -> list[str]:
+        """Metric groups enabled at startup"""
+        enabled = {
+            'latency': self.latency,
+            'queue': self.queue,
+            'latency_hist': self.iowait,
+            'request_size_hist': self.request_size}
+        return [group for group in GROUPS if enabled.get(group, True)]
+
+    @contextlib.contextmanager
+    def select(self, groups: list[str] = None):
+        """
+        Restrict collections in the current thread to the given groups, e.g.
+        for the duration of a single scrape.
+        """
+        self._selection.groups = groups
+
+        try:
+            yield
+        finally:
+            self._selection.groups = None
+
+    def run(self, groups: list[str]
+            ) -> dict[Type[iostat.Metric], list[iostat.Metric]]:
+        """Run and parse only the commands needed for the given groups"""
+        # Recording and replaying rely on the exact commands being run in
+        #   this process, so they are never sharded.
+        if self.workers > 1 and self.recorder is None and self.replay is None:
+            return self.gather_sharded(groups)
+
+        parts = []
+
+        if 'list' in groups:
+            parts.append(self.zlist())
+
+        if {'iostat', 'latency', 'queue'}.intersection(groups):
+            parts.append(self.ziostat('latency' in groups, 'queue' in groups))
+
+        if 'latency_hist' in groups:
+            parts.append(self.zhist_wait())
+
+        if 'request_size_hist' in groups:
+            parts.append(self.zhist_request())
 
-        if any([self.iowait, self.request_size]):
-            data |= self.zhist_wait() | self.zhist_request()
+        return self.merge(parts)
+
+    def gather(self, groups: list[str] = None
+               ) -> dict[Type[iostat.Metric], list[iostat.Metric]]:
+        """
+        Gather the metrics of the given groups, or of all enabled groups.
+
+        Results are cached per group for `cache_ttl` seconds. Collections of
+        the same group wait for each other, such that overlapping scrapes
+        share the result of a single run.
+        """
+        groups = [g for g in self.groups if groups is None or g in groups]
+        start = time.monotonic()
+
+        # Locks are always acquired in the same order to avoid deadlocks
+        with contextlib.ExitStack() as stack:
+            for group in groups:
+                stack.enter_context(self._locks[group])
+
+            stale = [
+                g for g in groups
+                if g not in self._cache
+                or self._cache[g][0] < start - self.cache_ttl]
+
+            if stale:
+                data = self.run(stale)
+                finished = time.monotonic()
+
+                for group in stale:
+                    self._cache[group] = (finished, {
+                        base: metrics for base, metrics in data.items()
+                        if base in GROUPS[group]
+                        or base is iostat.ParseMismatch})
+
+            cached = [self._cache[group][1] for group in groups]
+
+        # Groups from the same command share its mismatches, which are
+        #   therefore only included once per command.
+        data, mismatches = {}, {}
+
+        for part in cached:
+            for base, metrics in part.items():
+                if base is iostat.ParseMismatch:
+                    mismatches |= {m.pool: m for m in metrics}
+                else:
+                    data[base] = metrics
+
+        if mismatches:
+            data[iostat.ParseMismatch] = list(mismatches.values())
+
+        return data
+
+    def gather_sharded(self, groups: list[str]
+                       ) -> dict[Type[iostat.Metric], list[iostat.Metric]]:
+        """
+        Shard pools across worker processes, each of which runs and parses
+        the zpool commands for its own pools. Without `pools`, the pools are
+        listed first; when the list group is collected, its output is used
+        for this rather than listing the pools separately.
+        """
+        parts = []
+
+        if self.pools:
+            pools = self.pools
+        elif 'list' in groups:
+            parts.append(self.zlist())
+            pools = next((
+                [m.pool for m in metrics] for base, metrics in parts[0].items()
+                if base is not iostat.ParseMismatch), [])
+            groups = [group for group in groups if group != 'list']
+        else:
+            pools = self.list_pools()
+
+        shards = [pools[i::self.workers] for i in range(self.workers)]
+        shards = [shard for shard in shards if shard]
+
+        if not groups or not shards:
+            return self.merge(parts)
+
+        # Imported here, as loading multiprocessing slows down the startup of
+        #   exporters that use no workers
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+
+        for attempt in range(2):
+            with self._executor_lock:
+                if self._executor is None:
+                    # Workers are spawned rather than forked, as forking a
+                    #   process that runs the threaded HTTP server is unsafe.
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'))
+
+                executor = self._executor
+
+            try:
+                futures = [
+                    executor.submit(gather_shard, shard, groups)
+                    for shard in shards]
+                return self.merge(
+                    parts + [future.result() for future in futures])
+            except BrokenProcessPool:
+                # A worker that died, e.g. by the OOM killer, breaks the
+                #   whole pool, so the pool is replaced by a new one.
+                with self._executor_lock:
+                    if self._executor is executor:
+                        self._executor = None
+
+                executor.shutdown(wait=False, cancel_futures=True)
+
+                if attempt:
+                    raise
+
+                logger.warning('A worker process died; restarting workers')
+
+    @staticmethod
+    def merge(parts: list[dict[Type[iostat.Metric], list[iostat.Metric]]]
+              ) -> dict[Type[iostat.Metric], list[iostat.Metric]]:
+        """
+        Merge parsed output, combining metrics present in several parts. As
+        every part reports on the same commands, their mismatches are summed.
+        """
+        data = {}
+
+        for part in parts:
+            for base, metrics in part.items():
+                data.setdefault(base, []).extend(metrics)
+
+        if iostat.ParseMismatch in data:
+            mismatches = {}
+
+            for m in data[iostat.ParseMismatch]:
+                mismatches[m.pool] = mismatches.get(m.pool, 0) + m.value
+
+            data[iostat.ParseMismatch] = [
+                iostat.ParseMismatch(command, value)
+                for command, value in mismatches.items()]
+
+        return data
+
+    def collect(self):
+        groups = getattr(self._selection, 'groups', None)
+
+        if self.request_time is not None:
+            with self.request_time.time():
+                data = self.gather(groups)
+        else:
+            data = self.gather(groups)
+
+        # Only complete collections are published
+        if self.snapshot_writer is not None and groups is None:
+            self.snapshot_writer.publish(data)
+
+        dropped = GaugeMetricFamily(
+            name=f'{EXPORTER_PREFIX}_dropped_series',
+            labels=['metric'],
+            documentation=(
+                'Number of series dropped during the last collection because '
+                'the metric exceeded the series budget'))
+        errors = GaugeMetricFamily(
+            name=f'{EXPORTER_PREFIX}_parse_errors',
+            labels=['metric'],
+            documentation=(
+                'Number of values that could not be parsed during the last '
+                'collection'))
 
         for base, metrics in data.items():
             m = base.family(
-                name=base.name, labels=['pool'], documentation=base.doc)
+                name=base.name, labels=[base.label], documentation=base.doc)
+            series, dropped_series, parse_errors = 0, 0, 0
 
             for metric in metrics:
                 if metric.value is None:
+                    parse_errors += 1
+                    continue
+
+                # Parsed metrics may be cached and shared with other
+                #   collections and the snapshot, so they are never modified.
+                exposed = metric
+                if self.sparse_histograms and \
+                        base.family == HistogramMetricFamily:
+                    exposed = metric.sparse
+
+                # Enforce the series budget per metric family; pools that no
+                #   longer fit are dropped as a whole rather than partially.
+                if self.max_series is not None and \
+                        series + exposed.series > self.max_series:
+                    dropped_series += exposed.series
                     continue
 
+                series += exposed.series
+
                 if base.family in (CounterMetricFamily, GaugeMetricFamily):
                     m.add_metric([metric.pool], metric.value)
                 elif base.family == HistogramMetricFamily:
                     m.add_metric(
                         labels=[metric.pool],
-                        buckets=list(zip(metric.buckets, metric.value)),
-                        sum_value=sum(metric.value))
+                        buckets=exposed.cumulative,
+                        sum_value=metric.estimated_sum)
+
+            if dropped_series:
+                logger.debug(
+                    f'Dropped {dropped_series} series of {base.name}: series '
+                    f'budget of {self.max_series} exceeded')
+                dropped.add_metric([base.name], dropped_series)
+
+            if parse_errors:
+                errors.add_metric([base.name], parse_errors)
 
             yield m
+
+        yield errors
+
+        if self.max_series is not None:
+            yield dropped
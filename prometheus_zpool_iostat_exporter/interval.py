@@ -0,0 +1,26 @@
+import time
+from typing import Callable
+
+from . import logger
+
+
+def run_every(interval: float, task: Callable[[], object], name: str):
+    """
+    Run a task on a fixed interval, forever. Failures are logged under the
+    given name without stopping the loop. Intervals that were missed due to
+    a slow task are skipped rather than caught up on.
+    """
+    deadline = time.monotonic()
+
+    while True:
+        try:
+            task()
+        except Exception as exc:
+            logger.error(f'{name} failed: {exc}')
+
+        deadline += interval
+        now = time.monotonic()
+        if deadline < now:
+            deadline = now
+
+        time.sleep(deadline - now)
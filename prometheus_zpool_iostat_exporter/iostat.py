@@ -1,12 +1,21 @@
+import copy
+import itertools
+import math
 from dataclasses import dataclass, fields
 from typing import ClassVar
 
-from prometheus_client.core import (
-    GaugeMetricFamily, CounterMetricFamily, HistogramMetricFamily)
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
 
 from . import logger, EXPORTER_PREFIX
 
 
+"""
+Subclasses of the base metrics below only set class variables, so they reuse
+the dataclass methods of their base instead of being decorated themselves.
+This keeps the import, and thereby the startup, of the exporter fast.
+"""
+
+
 @dataclass
 class Metric:
     pool: str
@@ -14,6 +23,8 @@ class Metric:
     name: ClassVar[str]
     doc: ClassVar[str]
     family: ClassVar[type] = GaugeMetricFamily
+    label: ClassVar[str] = 'pool'
+    column: ClassVar[str] = None
 
     def _convert_field_types(self):
         for field in fields(self):
@@ -27,7 +38,8 @@ class Metric:
                 setattr(
                     self, field.name, field.type(getattr(self, field.name)))
             except ValueError as exc:
-                logger.error(
+                # Failed conversions are exported as parse errors
+                logger.debug(
                     f"Failed to convert {self.name}{{pool='{self.pool}'}} "
                     f"{self.value} to {field.type}: {exc}")
                 setattr(self, field.name, None)
@@ -35,14 +47,21 @@ class Metric:
     def __post_init__(self):
         self._convert_field_types()
 
+    @property
+    def series(self) -> int:
+        """Number of exposed series for this metric"""
+        return 1
+
 
 @dataclass
 class RatioMetric(Metric):
     def __post_init__(self):
         """Convert percentage to ratio"""
-        self.value = float(self.value)/100
         super().__post_init__()
 
+        if isinstance(self.value, float):
+            self.value /= 100
+
 
 @dataclass
 class StateMetric(Metric):
@@ -68,86 +87,158 @@ class StateMetric(Metric):
 class TimeMetric(Metric):
     def __post_init__(self):
         """Convert nanoseconds to seconds"""
-        self.value = float(self.value)*1e-9
         super().__post_init__()
 
+        if isinstance(self.value, float):
+            self.value *= 1e-9
+
 
 @dataclass
 class HistogramMetric(Metric):
+    """
+    Histogram of observations per bucket, where each bucket is labeled with
+    the upper bound of its observations. Bounds are given in nanoseconds and
+    converted to seconds unless the scale is overridden.
+    """
     buckets: list
     value: list
     family: ClassVar[type] = HistogramMetricFamily
+    scale: ClassVar[float] = 1e-9
 
     def __post_init__(self):
-        self.buckets = [str(float(bucket)*1e-9) for bucket in self.buckets]
+        self.buckets = [float(bucket)*self.scale for bucket in self.buckets]
         self.value = [float(value) for value in self.value]
         super().__post_init__()
 
+    @property
+    def series(self) -> int:
+        """One series per bucket and +Inf, plus the _count and _sum series"""
+        return len(self.buckets) + 3
+
+    @property
+    def cumulative(self) -> list[tuple[str, float]]:
+        """Cumulative bucket counts, ending with the +Inf bucket"""
+        counts = list(itertools.accumulate(
+            0 if math.isnan(value) else value for value in self.value))
+        return ([(str(b), c) for b, c in zip(self.buckets, counts)]
+                + [('+Inf', counts[-1] if counts else 0.0)])
+
+    @property
+    def lower(self) -> list[float]:
+        """Lower bound of each bucket, being the bound of the previous one"""
+        return [0.0] + self.buckets[:-1]
+
+    @property
+    def estimated_sum(self) -> float:
+        """Sum of observations, estimated from the bucket midpoints"""
+        return sum(
+            value * (low + high) / 2
+            for low, high, value in zip(self.lower, self.buckets, self.value)
+            if not math.isnan(value))
+
+    @property
+    def sparse(self) -> 'HistogramMetric':
+        """
+        Copy of this histogram without runs of empty buckets. A bucket is
+        kept when it holds observations, when it is the lower bound of the
+        next bucket holding observations, or when it is the last bucket. The
+        remaining buckets thus still describe every observation with the same
+        bounds. The histogram itself is left unchanged, as parsed metrics may
+        be shared between collections.
+        """
+        keep = [
+            i for i, value in enumerate(self.value)
+            if value != 0 or i == len(self.value) - 1
+            or self.value[i+1] != 0]
+        sparse = copy.copy(self)
+        sparse.buckets = [self.buckets[i] for i in keep]
+        sparse.value = [self.value[i] for i in keep]
+        return sparse
+
+
+@dataclass
+class SizeHistogramMetric(HistogramMetric):
+    """
+    Histogram of which the bucket bounds are given in bytes. Unlike latency
+    buckets, request size buckets are labeled with their lower bound, i.e. a
+    bucket holds requests from its own size up to the size of the next,
+    twice as large, bucket.
+    """
+    scale: ClassVar[float] = 1
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.buckets = [2 * bucket for bucket in self.buckets]
+
+    @property
+    def lower(self) -> list[float]:
+        return [bucket / 2 for bucket in self.buckets]
+
 
 """
 Parsed output from `zpool list -Hp`
 """
 
 
-@dataclass
 class Size(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_size_bytes'
     doc: ClassVar[str] = 'Byte size of a pool'
+    column: ClassVar[str] = 'size'
 
 
-@dataclass
 class Alloc(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_allocated_bytes'
     doc: ClassVar[str] = 'Bytes allocated in a pool'
+    column: ClassVar[str] = 'alloc'
 
 
-@dataclass
 class Free(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_free_bytes'
     doc: ClassVar[str] = 'Bytes free in a pool'
+    column: ClassVar[str] = 'free'
 
 
-@dataclass
 class CkPoint(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_checkpoint_bytes'
     doc: ClassVar[str] = 'Bytes allocated to a checkpoint in a pool'
+    column: ClassVar[str] = 'ckpoint'
 
 
-@dataclass
 class ExpandSz(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_expandsize_bytes'
     doc: ClassVar[str] = (
             'Unused capacity that can be expanded into when resizing disks')
+    column: ClassVar[str] = 'expandsz'
 
 
-@dataclass
 class Frag(RatioMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_fragmentation_ratio'
     doc: ClassVar[str] = 'Ratio of fragmentation of the free space in a pool'
+    column: ClassVar[str] = 'frag'
 
 
-@dataclass
 class Cap(RatioMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_capacity_ratio'
     doc: ClassVar[str] = (
             'Capacity of a pool expressed as a ratio of '
             'allocated_bytes:size_bytes')
+    column: ClassVar[str] = 'cap'
 
 
-@dataclass
 class Dedup(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_dedup_ratio'
     doc: ClassVar[str] = (
             'Indicator of how much deduplication has occurred as a ratio of '
             'referenced-bytes:logical-bytes')
+    column: ClassVar[str] = 'dedup'
 
 
-@dataclass
 class Health(StateMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_health_info'
     doc: ClassVar[str] = (
             'Pool health (0=ONLINE, 1=DEGRADED, 2=FAULTED, 3=OFFLINE, '
             '4=UNAVAIL, 5=REMOVED)')
+    column: ClassVar[str] = 'health'
 
 
 """
@@ -155,49 +246,46 @@ Parsed output from `zpool iostat -Hp`
 """
 
 
-@dataclass
 class CapacityAlloc(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_capacity_allocated_bytes'
     doc: ClassVar[str] = 'Amount of data currently stored in the pool'
+    column: ClassVar[str] = 'capacity_alloc'
 
 
-@dataclass
 class CapacityFree(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_capacity_free_bytes'
     doc: ClassVar[str] = 'Amount of disk space available in the pool'
+    column: ClassVar[str] = 'capacity_free'
 
 
-@dataclass
 class OperationsRead(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_operations_read_count'
     doc: ClassVar[str] = (
             'Number of read I/O operations sent to the pool, including '
-            'metadata requests')
-    family: ClassVar[type] = CounterMetricFamily
+            'metadata requests, per second')
+    column: ClassVar[str] = 'operations_read'
 
 
-@dataclass
 class OperationsWrite(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_operations_write_count'
-    doc: ClassVar[str] = 'Number of write I/O operations sent to the pool'
-    family: ClassVar[type] = CounterMetricFamily
+    doc: ClassVar[str] = (
+            'Number of write I/O operations sent to the pool, per second')
+    column: ClassVar[str] = 'operations_write'
 
 
-@dataclass
 class BandwidthRead(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_bandwidth_read_count'
     doc: ClassVar[str] = (
             'Bandwidth of all read operations (including metadata) as units '
             'per second')
-    family: ClassVar[type] = CounterMetricFamily
+    column: ClassVar[str] = 'bandwidth_read'
 
 
-@dataclass
 class BandwidthWrite(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_bandwidth_write_count'
     doc: ClassVar[str] = (
             'Bandwidth of all write operations as units per second')
-    family: ClassVar[type] = CounterMetricFamily
+    column: ClassVar[str] = 'bandwidth_write'
 
 
 """
@@ -205,77 +293,77 @@ Parsed average latency output from `zpool iostat -Hpl`
 """
 
 
-@dataclass
 class TotalWaitRead(TimeMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_total_wait_read_seconds'
     doc: ClassVar[str] = (
             'Average total read I/O time (queuing + disk I/O time)')
+    column: ClassVar[str] = 'total_wait_read'
 
 
-@dataclass
 class TotalWaitWrite(TimeMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_total_wait_write_seconds'
     doc: ClassVar[str] = (
             'Average total write I/O time (queuing + disk I/O time)')
+    column: ClassVar[str] = 'total_wait_write'
 
 
-@dataclass
 class DiskWaitRead(TimeMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_disk_wait_read_seconds'
     doc: ClassVar[str] = 'Average disk read I/O time (time reading the disk)'
+    column: ClassVar[str] = 'disk_wait_read'
 
 
-@dataclass
 class DiskWaitWrite(TimeMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_disk_wait_write_seconds'
     doc: ClassVar[str] = (
             'Average disk write I/O time (time writing to the disk)')
+    column: ClassVar[str] = 'disk_wait_write'
 
 
-@dataclass
 class SyncQWaitRead(TimeMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_syncq_wait_read_seconds'
     doc: ClassVar[str] = (
             'Average amount of time read I/O spent in synchronous priority '
             'queues. Does not include disk time')
+    column: ClassVar[str] = 'syncq_wait_read'
 
 
-@dataclass
 class SyncQWaitWrite(TimeMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_syncq_wait_write_seconds'
     doc: ClassVar[str] = (
             'Average amount of time write I/O spent in synchronous priority '
             'queues. Does not include disk time')
+    column: ClassVar[str] = 'syncq_wait_write'
 
 
-@dataclass
 class AsyncQWaitRead(TimeMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_asyncq_wait_read_seconds'
     doc: ClassVar[str] = (
             'Average amount of time read I/O spent in asynchronous priority '
             'queues. Does not include disk time')
+    column: ClassVar[str] = 'asyncq_wait_read'
 
 
-@dataclass
 class AsyncQWaitWrite(TimeMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_asyncq_wait_write_seconds'
     doc: ClassVar[str] = (
             'Average amount of time write I/O spent in asynchronous priority '
             'queues. Does not include disk time')
+    column: ClassVar[str] = 'asyncq_wait_write'
 
 
-@dataclass
 class Scrub(TimeMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_scrub_seconds'
     doc: ClassVar[str] = (
             'Average queuing time in scrub queue. Does not include disk time')
+    column: ClassVar[str] = 'scrub_wait'
 
 
-@dataclass
 class Trim(TimeMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_trim_seconds'
     doc: ClassVar[str] = (
         'Average queuing time in trim queue. Does not include disk time')
+    column: ClassVar[str] = 'trim_wait'
 
 
 """
@@ -283,92 +371,105 @@ Parsed average latency output from `zpool iostat -Hpq`
 """
 
 
-@dataclass
 class SyncQReadPend(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_syncq_read_pending_count'
     doc: ClassVar[str] = (
             'Current number of pending read entries in synchronous priority '
             'queues')
+    column: ClassVar[str] = 'syncq_read_pend'
 
 
-@dataclass
 class SyncQReadActiv(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_syncq_read_active_count'
     doc: ClassVar[str] = (
             'Current number of active read entries in synchronous priority '
             'queues')
+    column: ClassVar[str] = 'syncq_read_activ'
 
 
-@dataclass
 class SyncQWritePend(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_syncq_write_pending_count'
     doc: ClassVar[str] = (
             'Current number of pending write entries in synchronous priority '
             'queues')
+    column: ClassVar[str] = 'syncq_write_pend'
 
 
-@dataclass
 class SyncQWriteActiv(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_syncq_write_active_count'
     doc: ClassVar[str] = (
             'Current number of active write entries in synchronous priority '
             'queues')
+    column: ClassVar[str] = 'syncq_write_activ'
 
 
-@dataclass
 class ASyncQReadPend(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_asyncq_read_pending_count'
     doc: ClassVar[str] = (
         'Current number of pending read entries in asynchronous priority '
         'queues')
+    column: ClassVar[str] = 'asyncq_read_pend'
 
 
-@dataclass
 class ASyncQReadActiv(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_asyncq_read_active_count'
     doc: ClassVar[str] = (
         'Current number of active read entries in asynchronous priority '
         'queues')
+    column: ClassVar[str] = 'asyncq_read_activ'
 
 
-@dataclass
 class ASyncQWritePend(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_asyncq_write_pending_count'
     doc: ClassVar[str] = (
         'Current number of pending write entries in asynchronous priority '
         'queues')
+    column: ClassVar[str] = 'asyncq_write_pend'
 
 
-@dataclass
 class ASyncQWriteActiv(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_asyncq_wrote_active_count'
     doc: ClassVar[str] = (
         'Current number of active write entries in asynchronous priority '
         'queues')
+    column: ClassVar[str] = 'asyncq_write_activ'
 
 
-@dataclass
 class ScrubQPending(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_scrubq_pending_count'
     doc: ClassVar[str] = 'Current number of pending entries in scrub queue.'
+    column: ClassVar[str] = 'scrubq_read_pend'
 
 
-@dataclass
 class ScrubQActiv(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_scrubq_active_count'
     doc: ClassVar[str] = 'Current number of active entries in scrub queue.'
+    column: ClassVar[str] = 'scrubq_read_activ'
 
 
-@dataclass
 class TrimQPend(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_trimq_pending_count'
     doc: ClassVar[str] = 'Current number of pending entries in trim queue.'
+    column: ClassVar[str] = 'trimq_write_pend'
 
 
-@dataclass
 class TrimQActiv(Metric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_trimq_active_count'
     doc: ClassVar[str] = 'Current number of active entries in trim queue.'
+    column: ClassVar[str] = 'trimq_write_activ'
+
+
+"""
+Diagnostics of the parsing of zpool output
+"""
+
+
+class ParseMismatch(Metric):
+    name: ClassVar[str] = f'{EXPORTER_PREFIX}_parse_mismatched_rows'
+    doc: ClassVar[str] = (
+        'Number of rows in the output of a zpool command that did not match '
+        'its column layout and were skipped')
+    label: ClassVar[str] = 'command'
 
 
 """
@@ -376,7 +477,6 @@ Latency histograms from `zpool iostat -wpH`
 """
 
 
-@dataclass
 class LatencyTotalWaitRead(HistogramMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_latency_total_wait_read_seconds'
     doc: ClassVar[str] = (
@@ -384,7 +484,6 @@ class LatencyTotalWaitRead(HistogramMetric):
         'time)')
 
 
-@dataclass
 class LatencyTotalWaitWrite(HistogramMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_latency_total_wait_write_seconds'
     doc: ClassVar[str] = (
@@ -392,21 +491,18 @@ class LatencyTotalWaitWrite(HistogramMetric):
         'time)')
 
 
-@dataclass
 class LatencyDiskWaitRead(HistogramMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_latency_disk_wait_read_seconds'
     doc: ClassVar[str] = (
         'Latency histogram for disk read I/O time (time reading the disk)')
 
 
-@dataclass
 class LatencyDiskWaitWrite(HistogramMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_latency_disk_wait_write_seconds'
     doc: ClassVar[str] = (
         'Latency histogram for disk write I/O time (time writing to the disk)')
 
 
-@dataclass
 class LatencySyncQWaitRead(HistogramMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_latency_syncq_wait_read_seconds'
     doc: ClassVar[str] = (
@@ -414,7 +510,6 @@ class LatencySyncQWaitRead(HistogramMetric):
         'priority queues. Does not include disk time')
 
 
-@dataclass
 class LatencySyncQWaitWrite(HistogramMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_latency_syncq_wait_write_seconds'
     doc: ClassVar[str] = (
@@ -422,7 +517,6 @@ class LatencySyncQWaitWrite(HistogramMetric):
         'priority queues. Does not include disk time')
 
 
-@dataclass
 class LatencyAsyncQWaitRead(HistogramMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_latency_asyncq_wait_read_seconds'
     doc: ClassVar[str] = (
@@ -430,7 +524,6 @@ class LatencyAsyncQWaitRead(HistogramMetric):
         'priority queues. Does not include disk time')
 
 
-@dataclass
 class LatencyAsyncQWaitWrite(HistogramMetric):
     name: ClassVar[str] = (
             f'{EXPORTER_PREFIX}_latency_asyncq_wait_write_seconds')
@@ -439,7 +532,6 @@ class LatencyAsyncQWaitWrite(HistogramMetric):
         'asynchronous priority queues. Does not include disk time')
 
 
-@dataclass
 class LatencyScrub(HistogramMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_latency_scrub_seconds'
     doc: ClassVar[str] = (
@@ -447,7 +539,6 @@ class LatencyScrub(HistogramMetric):
         'include disk time')
 
 
-@dataclass
 class LatencyTrim(HistogramMetric):
     name: ClassVar[str] = f'{EXPORTER_PREFIX}_latency_trim_seconds'
     doc: ClassVar[str] = (
@@ -460,96 +551,84 @@ Request size histograms from `zpool iostat -rpH`
 """
 
 
-@dataclass
-class RequestSizeSyncReadIndividual(HistogramMetric):
+class RequestSizeSyncReadIndividual(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_sync_read_individual_bytes')
     doc: ClassVar[str] = (
         'Request size histogram for individual synchronous read I/O')
 
 
-@dataclass
-class RequestSizeSyncReadAggregate(HistogramMetric):
+class RequestSizeSyncReadAggregate(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_sync_read_aggregate_bytes')
     doc: ClassVar[str] = (
         'Request size histogram for aggregate synchronous read I/O')
 
 
-@dataclass
-class RequestSizeSyncWriteIndividual(HistogramMetric):
+class RequestSizeSyncWriteIndividual(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_sync_write_individual_bytes')
     doc: ClassVar[str] = (
         'Request size histogram for individual synchronous write I/O')
 
 
-@dataclass
-class RequestSizeSyncWriteAggregate(HistogramMetric):
+class RequestSizeSyncWriteAggregate(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_sync_write_aggregate_bytes')
     doc: ClassVar[str] = (
         'Request size histogram for aggregate synchronous write I/O')
 
 
-@dataclass
-class RequestSizeASyncReadIndividual(HistogramMetric):
+class RequestSizeASyncReadIndividual(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_async_read_individual_bytes')
     doc: ClassVar[str] = (
-        'Request size histogram for individual asynchronous I/O')
+        'Request size histogram for individual asynchronous read I/O')
 
 
-@dataclass
-class RequestSizeASyncReadAggregate(HistogramMetric):
+class RequestSizeASyncReadAggregate(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_async_read_aggregate_bytes')
     doc: ClassVar[str] = (
-        'Request size histogram for aggregate asynchronous I/O')
+        'Request size histogram for aggregate asynchronous read I/O')
 
 
-@dataclass
-class RequestSizeASyncWriteIndividual(HistogramMetric):
+class RequestSizeASyncWriteIndividual(SizeHistogramMetric):
     name: ClassVar[str] = (
-        f'{EXPORTER_PREFIX}_requestsize_sync_write_individual_bytes')
+        f'{EXPORTER_PREFIX}_requestsize_async_write_individual_bytes')
     doc: ClassVar[str] = (
         'Request size histogram for individual asynchronous write I/O')
 
 
-@dataclass
-class RequestSizeASyncWriteAggregate(HistogramMetric):
+class RequestSizeASyncWriteAggregate(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_async_write_aggregate_bytes')
     doc: ClassVar[str] = (
         'Request size histogram for aggregate asynchronous write I/O')
 
 
-@dataclass
-class RequestSizeScrubIndividual(HistogramMetric):
+class RequestSizeScrubIndividual(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_scrub_individual_bytes')
     doc: ClassVar[str] = (
         'Request size histogram for individual scrub I/O')
 
 
-@dataclass
-class RequestSizeScrubAggregate(HistogramMetric):
+class RequestSizeScrubAggregate(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_scrub_aggregate_bytes')
     doc: ClassVar[str] = (
         'Request size histogram for aggregate scrub I/O')
 
 
-@dataclass
-class RequestSizeTrimIndividual(HistogramMetric):
+class RequestSizeTrimIndividual(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_trim_individual_bytes')
     doc: ClassVar[str] = (
         'Request size histogram for individual trim I/O')
 
 
-@dataclass
-class RequestSizeTrimAggregate(HistogramMetric):
+class RequestSizeTrimAggregate(SizeHistogramMetric):
     name: ClassVar[str] = (
         f'{EXPORTER_PREFIX}_requestsize_trim_aggregate_bytes')
     doc: ClassVar[str] = (
@@ -1,12 +1,10 @@
 import argparse
 import logging
+import sys
 import time
 import urllib.parse
 
-from prometheus_client import start_http_server, REGISTRY
-
-from . import logger, DEFAULT_PORT
-from .exporter import ZPoolIOStatExporter
+from . import logger, DEFAULT_PORT, EXPORTER_PREFIX
 
 
 def parse_args():
@@ -37,6 +35,114 @@ def parse_args():
         type=str,
         default=f':{DEFAULT_PORT}',
         help=f'Address and port to listen on (default = :{DEFAULT_PORT})')
+    parser.add_argument(
+        '--max-series',
+        dest='max_series',
+        required=False,
+        type=int,
+        default=None,
+        help=(
+            'Maximum number of series exported per metric; series of pools '
+            'exceeding this budget are dropped (default = unlimited)'))
+    parser.add_argument(
+        '--sparse-histograms',
+        dest='sparse_histograms',
+        default=False,
+        action='store_true',
+        help=(
+            'Suppress runs of empty histogram buckets (only applies to -r and '
+            '-w)'))
+    output_group = parser.add_mutually_exclusive_group()
+    output_group.add_argument(
+        '--once',
+        dest='once',
+        default=False,
+        action='store_true',
+        help=(
+            'Collect metrics once, print them to stdout and exit instead of '
+            'listening for scrapes'))
+    output_group.add_argument(
+        '--remote-write',
+        dest='remote_write',
+        required=False,
+        type=str,
+        default=None,
+        help=(
+            'Send timestamped samples to this Prometheus remote write URL '
+            'instead of listening for scrapes'))
+    output_group.add_argument(
+        '--textfile',
+        dest='textfile',
+        required=False,
+        type=str,
+        default=None,
+        help=(
+            'Write metrics to this file for the textfile collector of the '
+            'node exporter instead of listening for scrapes'))
+    parser.add_argument(
+        '--push-interval',
+        dest='push_interval',
+        required=False,
+        type=float,
+        default=1.0,
+        help=(
+            'Seconds between samples sent with --remote-write '
+            '(default = 1.0)'))
+    parser.add_argument(
+        '--textfile-interval',
+        dest='textfile_interval',
+        required=False,
+        type=float,
+        default=15.0,
+        help='Seconds between writes to the textfile (default = 15.0)')
+    parser.add_argument(
+        '--snapshot',
+        dest='snapshot',
+        required=False,
+        type=str,
+        default=None,
+        help=(
+            'Publish the metrics of every collection to this memory-mapped '
+            'file for other local processes to read'))
+    parser.add_argument(
+        '--workers',
+        dest='workers',
+        required=False,
+        type=int,
+        default=1,
+        help=(
+            'Number of worker processes across which pools are divided '
+            'during collection; not used with --record or --replay '
+            '(default = 1)'))
+    parser.add_argument(
+        '--cache-ttl',
+        dest='cache_ttl',
+        required=False,
+        type=float,
+        default=0,
+        help=(
+            'Seconds for which collected metrics are reused by later '
+            'scrapes; overlapping scrapes always share a collection '
+            '(default = 0)'))
+    capture_group = parser.add_mutually_exclusive_group()
+    capture_group.add_argument(
+        '--record',
+        dest='record',
+        required=False,
+        type=str,
+        default=None,
+        help=(
+            'Append every zpool command along with its output and duration '
+            'to a capture file'))
+    capture_group.add_argument(
+        '--replay',
+        dest='replay',
+        required=False,
+        type=str,
+        default=None,
+        help=(
+            'Serve zpool output from a capture file instead of running zpool, '
+            'with the same timing as when it was recorded'))
     parser.add_argument(
         '-l',
         dest='latency',
@@ -76,14 +182,69 @@ def main():
         listen_addr = urllib.parse.urlsplit(f'//{args.listen_address}')
         addr = listen_addr.hostname if listen_addr.hostname else '0.0.0.0'
         port = listen_addr.port if listen_addr.port else DEFAULT_PORT
-        REGISTRY.register(ZPoolIOStatExporter(
+
+        # Imports are deferred until the arguments are parsed, such that
+        #   only the modules needed for the selected mode are loaded.
+        from prometheus_client import (
+            CollectorRegistry, Summary, generate_latest, REGISTRY)
+        from .exporter import ZPoolIOStatExporter
+
+        recorder, replay = None, None
+
+        if args.record or args.replay:
+            from .capture import CommandRecorder, CommandReplay
+            recorder = CommandRecorder(args.record) if args.record else None
+            replay = CommandReplay(args.replay) if args.replay else None
+
+        exporter = ZPoolIOStatExporter(
             pools=args.pools,
             latency=args.latency,
             queue=args.queue,
             iowait=args.iowait,
-            request_size=args.request_size))
-        start_http_server(port, addr=addr)
-        logger.info(f'Listening on {listen_addr.netloc}')
+            request_size=args.request_size,
+            max_series=args.max_series,
+            sparse_histograms=args.sparse_histograms,
+            recorder=recorder,
+            replay=replay,
+            workers=args.workers,
+            cache_ttl=args.cache_ttl)
+
+        if args.snapshot:
+            from .snapshot import SnapshotWriter
+            exporter.snapshot_writer = SnapshotWriter(args.snapshot)
+
+        if args.once:
+            registry = CollectorRegistry()
+            registry.register(exporter)
+            sys.stdout.write(generate_latest(registry).decode('utf-8'))
+            exit(0)
+        elif args.textfile:
+            from .textfile import TextfileWriter
+            registry = CollectorRegistry()
+            registry.register(exporter)
+            TextfileWriter(
+                args.textfile, registry, interval=args.textfile_interval
+            ).start()
+            logger.info(
+                f'Writing to {args.textfile} every {args.textfile_interval}s')
+        elif args.remote_write:
+            from .push import RemoteWriteEmitter
+            registry = CollectorRegistry()
+            registry.register(exporter)
+            RemoteWriteEmitter(
+                args.remote_write, registry, interval=args.push_interval
+            ).start()
+            logger.info(
+                f'Sampling every {args.push_interval}s for remote write to '
+                f'{args.remote_write}')
+        else:
+            exporter.request_time = Summary(
+                f'{EXPORTER_PREFIX}_collector_collect_seconds',
+                'Time spent to collect metrics from zpool')
+            from .web import start_http_server
+            REGISTRY.register(exporter)
+            start_http_server(exporter, port, addr=addr)
+            logger.info(f'Listening on {listen_addr.netloc}')
     except KeyboardInterrupt:
         logger.info('Interrupted by user')
         exit(0)
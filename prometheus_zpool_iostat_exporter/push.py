@@ -0,0 +1,252 @@
+import collections
+import http.client
+import itertools
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+
+from prometheus_client import CollectorRegistry
+
+from . import logger, VERSION
+from .interval import run_every
+
+# A sample of every series of a registry: the time it was taken in
+#   milliseconds, along with the sorted labels and value of each series.
+Sample = tuple[int, list[tuple[tuple[tuple[str, str], ...], float]]]
+
+
+def varint(value: int) -> bytes:
+    """Encode an unsigned integer as a variable-length integer"""
+    encoded = bytearray()
+
+    while value > 0x7f:
+        encoded.append(value & 0x7f | 0x80)
+        value >>= 7
+
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def field(number: int, payload: bytes) -> bytes:
+    """Encode a length-delimited protobuf field"""
+    return varint(number << 3 | 2) + varint(len(payload)) + payload
+
+
+def encode(samples: list[Sample]) -> bytes:
+    """
+    Encode samples as a protobuf `WriteRequest` of the Prometheus remote
+    write protocol, in which the samples of each series are in time order.
+    """
+    series = {}
+
+    for timestamp, values in samples:
+        for labels, value in values:
+            # Sample: double value = 1; int64 timestamp = 2;
+            series.setdefault(labels, []).append(
+                b'\x09' + struct.pack('<d', value) + b'\x10'
+                + varint(timestamp))
+
+    # WriteRequest: repeated TimeSeries timeseries = 1;
+    # TimeSeries: repeated Label labels = 1; repeated Sample samples = 2;
+    # Label: string name = 1; string value = 2;
+    return b''.join(
+        field(1, b''.join(
+            [field(1, field(1, name.encode()) + field(2, value.encode()))
+             for name, value in labels]
+            + [field(2, sample) for sample in samples]))
+        for labels, samples in series.items())
+
+
+def snappy(data: bytes) -> bytes:
+    """
+    Frame data in the snappy block format required by remote write. The data
+    is stored as uncompressed literals, which every snappy decoder accepts,
+    such that no compression library is needed.
+    """
+    framed = [varint(len(data))]
+
+    for start in range(0, len(data), 0x10000):
+        chunk = data[start:start + 0x10000]
+        length = len(chunk) - 1
+
+        if length < 60:
+            framed.append(bytes([length << 2]))
+        elif length < 0x100:
+            framed.append(bytes([60 << 2, length]))
+        else:
+            framed.append(bytes([61 << 2]) + length.to_bytes(2, 'little'))
+
+        framed.append(chunk)
+
+    return b''.join(framed)
+
+
+class RemoteWriteEmitter:
+    """
+    Sample a registry on a fixed interval and send the samples to a
+    Prometheus remote write endpoint, each with the time it was taken. Unlike
+    scraping, every sample is thereby stored, regardless of the scrape
+    interval. Samples are queued in memory and sent in batches by a separate
+    thread, such that a slow endpoint does not delay sampling. A batch is
+    sent once `batch_size` samples are queued, or `flush_interval` seconds
+    after the previous one. The queue holds at most `capacity` samples; when
+    sending falls behind further, the oldest samples are dropped.
+    """
+    def __init__(self,
+                 url: str,
+                 registry: CollectorRegistry,
+                 job: str = 'zpool_iostat',
+                 instance: str = None,
+                 interval: float = 1.0,
+                 timeout: float = 5.0,
+                 capacity: int = 600,
+                 batch_size: int = 60,
+                 flush_interval: float = 5.0):
+        split = urllib.parse.urlsplit(url if '://' in url else f'http://{url}')
+        self.url = url
+        self.registry = registry
+        self.job = job
+        self.instance = instance if instance else socket.gethostname()
+        self.interval = interval
+        self.timeout = timeout
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.secure = split.scheme == 'https'
+        self.host = split.hostname
+        self.port = split.port
+        self.path = (
+            (split.path if split.path else '/api/v1/write')
+            + (f'?{split.query}' if split.query else ''))
+        self.dropped = 0
+        self._dropping = False
+        self._connection = None
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+
+    def start(self):
+        threading.Thread(
+            target=run_every, args=(self.interval, self.sample, 'Sampling'),
+            daemon=True).start()
+        threading.Thread(target=self._flush, daemon=True).start()
+
+    def _flush(self):
+        backoff = self.interval
+
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: len(self._queue) >= self.batch_size,
+                    self.flush_interval)
+
+            try:
+                self.flush()
+                backoff = self.interval
+            except Exception as exc:
+                logger.error(f'Remote write to {self.url} failed: {exc}')
+                time.sleep(backoff)
+                backoff = min(2 * backoff, 30.0)
+
+    def sample(self):
+        """Take a sample of every series in the registry and queue it"""
+        timestamp = int(time.time() * 1000)
+        values = []
+
+        for family in self.registry.collect():
+            for s in family.samples:
+                labels = s.labels | {
+                    '__name__': s.name,
+                    'job': self.job,
+                    'instance': self.instance}
+                values.append(
+                    (tuple(sorted(labels.items())), float(s.value)))
+
+        with self._condition:
+            if len(self._queue) >= self.capacity:
+                self._queue.popleft()
+                self.dropped += 1
+
+                # Warn once when dropping starts, not for every sample
+                if not self._dropping:
+                    logger.warning(
+                        f'Remote write to {self.url} is falling behind; '
+                        f'dropping the oldest samples '
+                        f'({self.dropped} dropped so far)')
+                    self._dropping = True
+            else:
+                self._dropping = False
+
+            self._queue.append((timestamp, values))
+
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify()
+
+    def flush(self) -> int:
+        """
+        Send up to `batch_size` of the oldest queued samples and return the
+        number of samples sent. If the endpoint is unreachable, or responds
+        with a server error or 429, the samples stay queued to be retried.
+        Samples rejected for any other reason are discarded, as retrying
+        them would fail again.
+        """
+        with self._condition:
+            batch = list(itertools.islice(self._queue, self.batch_size))
+
+        if not batch:
+            return 0
+
+        status, body = self._post(snappy(encode(batch)))
+
+        if status >= 500 or status == 429:
+            raise Exception(f'HTTP {status}: {body}')
+
+        # The oldest samples may have been dropped while sending
+        sent = {id(sample) for sample in batch}
+
+        with self._condition:
+            while self._queue and id(self._queue[0]) in sent:
+                self._queue.popleft()
+
+        if status >= 400:
+            raise Exception(
+                f'HTTP {status}: {body}; {len(batch)} samples discarded')
+
+        return len(batch)
+
+    def _post(self, payload: bytes) -> tuple[int, str]:
+        """
+        Post a payload over a keep-alive connection. The connection is
+        re-established once if the endpoint closed it in the meantime.
+        """
+        for attempt in range(2):
+            if self._connection is None:
+                connection = (
+                    http.client.HTTPSConnection if self.secure
+                    else http.client.HTTPConnection)
+                self._connection = connection(
+                    self.host, self.port, timeout=self.timeout)
+
+            try:
+                self._connection.request(
+                    'POST', self.path, body=payload,
+                    headers={
+                        'Content-Encoding': 'snappy',
+                        'Content-Type': 'application/x-protobuf',
+                        'User-Agent':
+                            f'prometheus-zpool-iostat-exporter/{VERSION}',
+                        'X-Prometheus-Remote-Write-Version': '0.1.0'})
+                response = self._connection.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                self._connection.close()
+                self._connection = None
+
+                if attempt:
+                    raise
+
+                continue
+
+            return (response.status,
+                    body.decode('utf-8', 'replace').strip())
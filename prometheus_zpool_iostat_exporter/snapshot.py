@@ -0,0 +1,169 @@
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Type, Union
+
+from . import iostat
+
+"""
+Layout of the snapshot file: a fixed-size header followed by the snapshot
+as UTF-8 encoded JSON. The header holds a magic string, the format version,
+a sequence number, the time of publishing and the length of the snapshot.
+The sequence number is odd while a snapshot is being written, so readers
+retry whenever it is odd or changed while they were reading (seqlock).
+"""
+MAGIC = b'ZPIOSNAP'
+VERSION = 1
+HEADER = struct.Struct('<8sIxxxxQdQ')
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 16
+CONTENT = struct.Struct('<dQ')
+CONTENT_OFFSET = 24
+INITIAL_SIZE = 64 * 1024
+
+
+def number(value) -> Union[float, None]:
+    """Missing values ('-' in zpool output) are published as null"""
+    if value is None or value == 'NaN' or \
+            isinstance(value, float) and math.isnan(value):
+        return
+
+    return value
+
+
+class SnapshotWriter:
+    """
+    Publish the parsed output of the latest collection to a memory-mapped
+    file, such that other local processes can read it without running zpool
+    themselves. The file only ever grows, so readers can keep it mapped.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(
+            os.open(path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+        size = os.fstat(self._file.fileno()).st_size
+
+        if size < INITIAL_SIZE:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+
+        self._map = mmap.mmap(self._file.fileno(), size)
+        magic, version, sequence, _, _ = HEADER.unpack_from(self._map)
+
+        # Continue the sequence of an existing snapshot so that readers do
+        #   not mistake a restarted writer for an unchanged snapshot. A
+        #   snapshot that was left half-written is discarded.
+        if magic != MAGIC or version != VERSION:
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, 0, 0.0, 0)
+            sequence = 0
+        elif sequence % 2:
+            sequence += 1
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, sequence, 0.0, 0)
+
+        self._sequence = sequence
+
+    @staticmethod
+    def serialize(data: dict[Type[iostat.Metric], list[iostat.Metric]]
+                  ) -> dict:
+        snapshot = {}
+
+        for base, metrics in data.items():
+            if issubclass(base, iostat.HistogramMetric):
+                snapshot[base.name] = {
+                    m.pool: {
+                        'buckets': m.buckets,
+                        'counts': [number(value) for value in m.value]}
+                    for m in metrics}
+            else:
+                snapshot[base.name] = {
+                    m.pool: number(m.value) for m in metrics}
+
+        return snapshot
+
+    def publish(self, data: dict[Type[iostat.Metric], list[iostat.Metric]]):
+        # NaN is not valid JSON, so it is rejected rather than written as is
+        payload = json.dumps(
+            self.serialize(data), separators=(',', ':'), allow_nan=False
+        ).encode('utf-8')
+        size = HEADER.size + len(payload)
+
+        with self._lock:
+            if size > len(self._map):
+                self._map.resize(max(size, 2 * len(self._map)))
+
+            self._sequence += 1
+            SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, self._sequence)
+            self._map[HEADER.size:size] = payload
+            CONTENT.pack_into(
+                self._map, CONTENT_OFFSET, time.time(), len(payload))
+            self._sequence += 1
+            SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, self._sequence)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class SnapshotReader:
+    """
+    Read snapshots published by `SnapshotWriter`. `read()` returns None if
+    nothing was published yet, and otherwise a dictionary holding the
+    sequence number, the time of publishing and the metrics, keyed by metric
+    name and pool. Missing values are null.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = None
+
+    def _remap(self):
+        size = os.fstat(self._file.fileno()).st_size
+
+        if self._map is None or len(self._map) != size:
+            if self._map is not None:
+                self._map.close()
+
+            self._map = mmap.mmap(
+                self._file.fileno(), size, access=mmap.ACCESS_READ)
+
+    def read(self, retries: int = 1000) -> Union[dict, None]:
+        for _ in range(retries):
+            self._remap()
+            magic, version, sequence, timestamp, length = HEADER.unpack_from(
+                self._map)
+
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(
+                    f'{self.path} is not a version {VERSION} snapshot')
+
+            # The writer is writing, or grew the file after it was mapped
+            if sequence % 2 or HEADER.size + length > len(self._map):
+                time.sleep(0)
+                continue
+
+            payload = self._map[HEADER.size:HEADER.size + length]
+            current, = SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)
+
+            if current != sequence:
+                continue
+
+            if not length:
+                return
+
+            return {
+                'sequence': sequence,
+                'timestamp': timestamp,
+                'metrics': json.loads(payload)}
+
+        raise TimeoutError(f'No consistent snapshot in {self.path}')
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+
+        self._file.close()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import threading
+
+from prometheus_client import CollectorRegistry, generate_latest
+
+from .interval import run_every
+
+
+class TextfileWriter:
+    """
+    Write the exposition of a registry to a file on a fixed interval, for use
+    with the textfile collector of the node exporter. The exposition is
+    written to a temporary file in the same directory and renamed into place,
+    such that the node exporter never reads a partially written file. If the
+    exposition did not change since the last write, the file is only touched
+    to keep its modification time current.
+    """
+    def __init__(self,
+                 path: str,
+                 registry: CollectorRegistry,
+                 interval: float = 15.0):
+        self.path = os.path.abspath(path)
+        self.registry = registry
+        self.interval = interval
+        self._previous = None
+
+    def start(self):
+        threading.Thread(
+            target=run_every,
+            args=(self.interval, self.write, f'Writing {self.path}'),
+            daemon=True).start()
+
+    def write(self):
+        payload = generate_latest(self.registry)
+
+        if payload == self._previous and os.path.exists(self.path):
+            os.utime(self.path)
+            return
+
+        # The node exporter only reads files ending in .prom, so the
+        #   temporary file is ignored until it is renamed.
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path),
+            prefix=f'.{os.path.basename(self.path)}.',
+            suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self._previous = payload
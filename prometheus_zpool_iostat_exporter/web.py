@@ -0,0 +1,56 @@
+import socket
+import threading
+import urllib.parse
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+from prometheus_client import make_wsgi_app, REGISTRY
+from prometheus_client.exposition import ThreadingWSGIServer
+
+from . import logger
+from .exporter import ZPoolIOStatExporter, GROUPS
+
+
+class SilentHandler(WSGIRequestHandler):
+    """WSGI handler that does not log requests"""
+    def log_message(self, format, *args):
+        pass
+
+
+def make_selecting_app(exporter: ZPoolIOStatExporter, registry=REGISTRY):
+    """
+    Create a WSGI app serving the metrics of a registry, where the metric
+    groups collected by the exporter can be selected per scrape using one or
+    more `collect[]` query parameters, e.g. `/metrics?collect[]=iostat`.
+    """
+    app = make_wsgi_app(registry)
+
+    def selecting_app(environ, start_response):
+        params = urllib.parse.parse_qs(environ.get('QUERY_STRING', ''))
+        groups = params.get('collect[]')
+
+        if groups is not None:
+            for group in set(groups).difference(GROUPS):
+                logger.debug(f"Ignoring unknown metric group '{group}'")
+
+        with exporter.select(groups):
+            return app(environ, start_response)
+
+    return selecting_app
+
+
+def start_http_server(exporter: ZPoolIOStatExporter,
+                      port: int,
+                      addr: str = '0.0.0.0',
+                      registry=REGISTRY):
+    """Serve the metrics of a registry from a daemon thread"""
+    class Server(ThreadingWSGIServer):
+        pass
+
+    # Select the address family of the listen address, e.g. IPv6
+    family, _, _, _, sockaddr = next(iter(socket.getaddrinfo(
+        addr, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE)))
+    Server.address_family = family
+    httpd = make_server(
+        sockaddr[0], port, make_selecting_app(exporter, registry), Server,
+        handler_class=SilentHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
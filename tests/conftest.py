@@ -0,0 +1,52 @@
+import pathlib
+
+import pytest
+
+from prometheus_zpool_iostat_exporter import exporter
+from prometheus_zpool_iostat_exporter.capture import CommandReplay
+from prometheus_zpool_iostat_exporter.exporter import ZPoolIOStatExporter
+
+FIXTURES = pathlib.Path(__file__).parent / 'fixtures'
+
+
+@pytest.fixture(autouse=True)
+def clear_layouts():
+    """Column layouts are cached per process, so each test detects its own"""
+    exporter.LAYOUTS.clear()
+    exporter.MISMATCHED.clear()
+    yield
+    exporter.LAYOUTS.clear()
+    exporter.MISMATCHED.clear()
+
+
+@pytest.fixture
+def replaying():
+    """
+    Create exporters replaying a capture in `tests/fixtures`. Unless given
+    otherwise, exporters are created with the arguments zpool.capture was
+    recorded with (-lqwr).
+    """
+    def replaying(capture: str = 'zpool.capture', **kwargs
+                  ) -> ZPoolIOStatExporter:
+        kwargs = {
+            'latency': True,
+            'queue': True,
+            'iowait': True,
+            'request_size': True} | kwargs
+        return ZPoolIOStatExporter(
+            replay=CommandReplay(FIXTURES / capture, timing=False), **kwargs)
+
+    return replaying
+
+
+@pytest.fixture
+def commands(monkeypatch) -> list[list[str]]:
+    """Record every command run by exporters during a test"""
+    calls, run_cmd = [], ZPoolIOStatExporter.run_cmd
+
+    def recording(self, command: list[str]):
+        calls.append(command)
+        return run_cmd(self, command)
+
+    monkeypatch.setattr(ZPoolIOStatExporter, 'run_cmd', recording)
+    return calls
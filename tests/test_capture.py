@@ -0,0 +1,78 @@
+import json
+import logging
+
+import pytest
+
+from prometheus_zpool_iostat_exporter.capture import (
+    CommandRecorder, CommandReplay)
+from prometheus_zpool_iostat_exporter.exporter import ZPoolIOStatExporter
+
+
+def collect(exporter: ZPoolIOStatExporter) -> dict:
+    return {family.name: family for family in exporter.collect()}
+
+
+def test_replay_through_collect(replaying):
+    families = collect(replaying())
+
+    size = families['zpool_iostat_size_bytes'].samples
+    assert [(s.labels['pool'], s.value) for s in size] == [
+        ('tank', 1855425871872.0), ('backup', 3985729650688.0)]
+
+    health = families['zpool_iostat_health_info'].samples
+    assert [s.value for s in health] == [0, 1]
+
+    disk_wait = families['zpool_iostat_disk_wait_read_seconds'].samples
+    assert disk_wait[0].value == pytest.approx(312640e-9)
+
+    assert 'zpool_iostat_latency_total_wait_read_seconds' in families
+    assert 'zpool_iostat_requestsize_sync_read_individual_bytes' in families
+    assert not families['zpool_iostat_parse_errors'].samples
+
+
+def test_replay_error(replaying, caplog):
+    exporter = replaying(
+        'failures.capture', latency=False, queue=False, request_size=False)
+
+    with caplog.at_level(logging.ERROR):
+        families = collect(exporter)
+
+    assert "'zpool iostat -wpH' failed: [Errno 2]" in caplog.text
+    assert 'zpool_iostat_size_bytes' in families
+    assert not any(name.startswith('zpool_iostat_latency_')
+                   for name in families)
+
+
+def test_replay_stderr(replaying):
+    exporter = replaying(
+        'failures.capture', latency=False, queue=False, iowait=False)
+
+    with pytest.raises(Exception, match='/dev/zfs and /proc/self/mounts'):
+        collect(exporter)
+
+
+def test_replay_missing_capture(replaying, caplog):
+    with caplog.at_level(logging.ERROR):
+        families = collect(replaying(pools=['missing']))
+
+    assert "'zpool list -H -p missing' failed: no capture" in caplog.text
+    assert 'zpool_iostat_size_bytes' not in families
+
+
+def test_record_then_replay(tmp_path):
+    path = tmp_path / 'zpool.capture'
+    recorder = CommandRecorder(path)
+    recorder.record(['zpool', 'version'], 'zfs-2.1.5-1\n', '', 0.0123456789)
+    recorder.record(['zpool', 'version'], 'zfs-2.1.6-1\n', '', 0.01)
+    recorder.record(['zpool', 'status'], '', '', 0.01, error='timed out')
+
+    assert json.loads(path.read_text().split('\n')[0])['duration'] == 0.012346
+
+    replay = CommandReplay(path, timing=False)
+
+    # Captures of the same command are cycled through in recorded order
+    assert [replay.replay(['zpool', 'version'])['stdout']
+            for _ in range(3)] == [
+        'zfs-2.1.5-1\n', 'zfs-2.1.6-1\n', 'zfs-2.1.5-1\n']
+    assert replay.replay(['zpool', 'status'])['error'] == 'timed out'
+    assert replay.replay(['zpool', 'iostat']) is None
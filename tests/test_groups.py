@@ -0,0 +1,58 @@
+import io
+
+from prometheus_client import CollectorRegistry, generate_latest
+
+from prometheus_zpool_iostat_exporter import iostat
+from prometheus_zpool_iostat_exporter.snapshot import (
+    SnapshotReader, SnapshotWriter)
+from prometheus_zpool_iostat_exporter.web import make_selecting_app
+
+
+def scrape(app, query: str = '') -> str:
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': '/metrics',
+        'QUERY_STRING': query, 'wsgi.input': io.BytesIO()}
+    return b''.join(app(environ, lambda status, headers: None)).decode()
+
+
+def test_groups_are_selected_per_scrape(replaying, commands):
+    e = replaying()
+    registry = CollectorRegistry()
+    registry.register(e)
+    app = make_selecting_app(e, registry)
+
+    selected = scrape(app, 'collect[]=list&collect[]=unknown')
+    assert 'zpool_iostat_size_bytes{' in selected
+    assert 'zpool_iostat_operations_read_count{' not in selected
+    assert all(command[1] == 'list' for command in commands)
+
+    complete = scrape(app)
+    assert 'zpool_iostat_operations_read_count{' in complete
+    assert 'zpool_iostat_requestsize_trim_aggregate_bytes_bucket{' in complete
+
+
+def test_cached_histograms_are_not_modified(replaying, tmp_path):
+    path = tmp_path / 'zpool_iostat.snapshot'
+    e = replaying(
+        sparse_histograms=True, cache_ttl=60, snapshot_writer=SnapshotWriter(path))
+    registry = CollectorRegistry()
+    registry.register(e)
+    reader = SnapshotReader(path)
+
+    expositions, snapshots = [], []
+
+    for _ in range(2):
+        expositions.append(generate_latest(registry))
+        snapshots.append(reader.read()['metrics'])
+
+    assert expositions[0] == expositions[1]
+    assert snapshots[0] == snapshots[1]
+    assert len(snapshots[1]['zpool_iostat_latency_total_wait_read_seconds'][
+        'tank']['buckets']) == 37
+
+    # The exposition is sparse, the cached metrics are not
+    cached = e.gather()[iostat.LatencyTotalWaitRead]
+    assert [len(m.buckets) for m in cached] == [37, 37]
+    assert expositions[0].count(
+        b'zpool_iostat_latency_total_wait_read_seconds_bucket{') == sum(
+        len(m.sparse.buckets) + 1 for m in cached) < 2 * (37 + 1)
@@ -0,0 +1,112 @@
+import collections
+import json
+import math
+
+import pytest
+from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client.parser import text_string_to_metric_families
+
+from conftest import FIXTURES
+
+
+def output(command: str) -> str:
+    """Output of a command in the fixture capture"""
+    for line in (FIXTURES / 'zpool.capture').open():
+        capture = json.loads(line)
+
+        if capture['command'] == command.split():
+            return capture['stdout']
+
+
+@pytest.fixture
+def families(replaying) -> dict:
+    registry = CollectorRegistry()
+    registry.register(replaying())
+
+    # Parse the exposition, as Prometheus would
+    exposition = generate_latest(registry).decode('utf-8')
+    families = list(text_string_to_metric_families(exposition))
+    names = [family.name for family in families]
+    assert len(names) == len(set(names)), 'family names must be unique'
+
+    return {family.name: family for family in families}
+
+
+def histograms(families: dict) -> dict:
+    """Samples of each histogram, keyed by histogram and pool"""
+    samples = collections.defaultdict(lambda: collections.defaultdict(list))
+
+    for family in families.values():
+        if family.type == 'histogram':
+            for s in family.samples:
+                samples[family.name][s.labels['pool']].append(s)
+
+    return samples
+
+
+def test_histograms_are_cumulative(families):
+    samples = histograms(families)
+    assert len(samples) == 10 + 12
+
+    for name, pools in samples.items():
+        assert pools.keys() == {'tank', 'backup'}
+
+        for pool in pools.values():
+            buckets = [s for s in pool if s.name.endswith('_bucket')]
+            bounds = [float(s.labels['le']) for s in buckets]
+            counts = [s.value for s in buckets]
+            count, = [s.value for s in pool if s.name.endswith('_count')]
+            total, = [s.value for s in pool if s.name.endswith('_sum')]
+
+            assert buckets[-1].labels['le'] == '+Inf'
+            assert bounds == sorted(bounds) and len(set(bounds)) == len(bounds)
+            assert counts == sorted(counts)
+            assert counts[-1] == count
+            assert total >= 0 and (total > 0) == (count > 0)
+
+
+def test_latency_buckets_are_upper_bounds(families):
+    tank = histograms(families)[
+        'zpool_iostat_latency_total_wait_read_seconds']['tank']
+    rows = output('zpool iostat -wpH').split('\n\n')[0].split('\n')[1:]
+    bounds = [float(s.labels['le']) for s in tank if 'le' in s.labels]
+
+    # Rows are labeled (1 << (j + 1)) - 1 nanoseconds
+    assert len(rows) == 37
+    assert bounds[:-1] == pytest.approx(
+        [int(row.split('\t')[0]) * 1e-9 for row in rows])
+    assert bounds[:3] == pytest.approx([1e-9, 3e-9, 7e-9])
+
+
+def test_request_size_buckets_are_lower_bounds(families):
+    tank = histograms(families)[
+        'zpool_iostat_requestsize_sync_read_individual_bytes']['tank']
+    rows = [
+        row.split('\t')
+        for row in output('zpool iostat -rpH').split('\n\n')[0].split('\n')[1:]]
+    buckets = [s for s in tank if s.name.endswith('_bucket')]
+
+    # Rows are labeled 1 << j bytes, holding requests up to the next row
+    assert [float(s.labels['le']) for s in buckets][:3] == [1024, 2048, 4096]
+    assert float(buckets[-2].labels['le']) == 2 * int(rows[-1][0])
+
+    # Counts below the first bound are those of the first row only
+    assert buckets[0].value == int(rows[0][1])
+
+    total, = [s.value for s in tank if s.name.endswith('_sum')]
+    assert total == pytest.approx(sum(
+        int(row[1]) * 1.5 * int(row[0]) for row in rows))
+
+
+def test_other_metrics_are_gauges(families):
+    for name, family in families.items():
+        if not name.startswith('zpool_iostat_latency_') and \
+                not name.startswith('zpool_iostat_requestsize_'):
+            assert family.type == 'gauge', name
+
+    rates = [
+        'zpool_iostat_operations_read_count',
+        'zpool_iostat_bandwidth_write_count']
+    assert all(name in families for name in rates)
+    assert not any(math.isnan(s.value)
+                   for name in rates for s in families[name].samples)
@@ -0,0 +1,86 @@
+import json
+import logging
+
+from prometheus_zpool_iostat_exporter import exporter
+from prometheus_zpool_iostat_exporter.exporter import ZPoolIOStatExporter
+
+from conftest import FIXTURES
+
+
+def scrape(e: ZPoolIOStatExporter) -> dict:
+    """Collect the values of all metrics labeled by pool"""
+    return {
+        family.name: {s.labels['pool']: s.value for s in family.samples}
+        for family in e.collect()
+        if all('pool' in s.labels for s in family.samples)}
+
+
+def test_layout_is_detected_once(replaying, commands):
+    e = replaying(iowait=False, request_size=False)
+
+    for _ in range(3):
+        scrape(e)
+
+    assert len(commands) == 2 + 2 * 3
+    assert exporter.LAYOUTS[('zpool', 'list', '-H', '-p')] is not None
+
+
+def test_unrecognized_header_is_cached(replaying, commands, tmp_path, caplog):
+    # A capture recorded without the unscripted output used for detection
+    path = tmp_path / 'scripted.capture'
+    path.write_text(''.join(
+        line for line in (FIXTURES / 'zpool.capture').open()
+        if '-H' in json.loads(line)['command']))
+    detected = scrape(replaying(iowait=False, request_size=False))
+    exporter.LAYOUTS.clear()
+    commands.clear()
+
+    e = replaying(path, iowait=False, request_size=False)
+
+    with caplog.at_level(logging.ERROR):
+        positional = [scrape(e) for _ in range(3)]
+
+    assert len(commands) == 2 + 2 * 3
+    assert caplog.text.count('no capture') == 2
+    assert exporter.LAYOUTS[('zpool', 'list', '-H', '-p')] is None
+
+    # Columns are then assumed to be in the order of the metrics
+    assert all(p.keys() == detected.keys() for p in positional)
+    assert positional[0]['zpool_iostat_size_bytes'] == \
+        detected['zpool_iostat_size_bytes']
+
+
+def mismatches(e: ZPoolIOStatExporter) -> dict[str, float]:
+    return {
+        s.labels['command']: s.value for f in e.collect()
+        if f.name == 'zpool_iostat_parse_mismatched_rows' for s in f.samples}
+
+
+def test_mismatch_drops_layout(replaying):
+    e = replaying(iowait=False, request_size=False)
+    scrape(e)
+    key = ('zpool', 'list', '-H', '-p')
+    width, columns = exporter.LAYOUTS[key]
+    exporter.LAYOUTS[key] = (width + 1, columns)
+
+    assert mismatches(e)['zpool list -H -p'] == 2
+    assert key not in exporter.LAYOUTS
+
+    # The layout is detected again, and matches
+    assert mismatches(e)['zpool list -H -p'] == 0
+    assert exporter.LAYOUTS[key] == (width, columns)
+
+
+def test_persistent_mismatch_is_reprobed_rarely(
+        replaying, commands, monkeypatch):
+    # A header with a column more than the rows have
+    parse_header = ZPoolIOStatExporter.parse_header
+    monkeypatch.setattr(
+        ZPoolIOStatExporter, 'parse_header',
+        staticmethod(lambda data: parse_header(data) + ['extra']))
+    e = replaying(iowait=False, request_size=False)
+
+    results = [mismatches(e) for _ in range(2 + exporter.REPROBE_SCRAPES)]
+
+    assert all(r['zpool list -H -p'] == 2 for r in results)
+    assert commands.count(['zpool', 'list', '-p']) == 3
@@ -0,0 +1,230 @@
+import http.server
+import struct
+import threading
+import time
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from prometheus_zpool_iostat_exporter.push import RemoteWriteEmitter
+
+
+def read_varint(data: bytes, position: int) -> tuple[int, int]:
+    value, shift = 0, 0
+
+    while True:
+        byte = data[position]
+        value |= (byte & 0x7f) << shift
+        position += 1
+        shift += 7
+
+        if not byte & 0x80:
+            return value, position
+
+
+def unsnappy(data: bytes) -> bytes:
+    """Decode snappy blocks consisting of literals only"""
+    length, position = read_varint(data, 0)
+    decoded = b''
+
+    while position < len(data):
+        tag = data[position]
+        assert tag & 0b11 == 0, 'only literals are expected'
+        size = tag >> 2
+        position += 1
+
+        if size >= 60:
+            extra = size - 59
+            size = int.from_bytes(data[position:position + extra], 'little')
+            position += extra
+
+        decoded += data[position:position + size + 1]
+        position += size + 1
+
+    assert len(decoded) == length
+    return decoded
+
+
+def fields(data: bytes) -> list[tuple[int, object]]:
+    """Decode the fields of a protobuf message"""
+    decoded, position = [], 0
+
+    while position < len(data):
+        key, position = read_varint(data, position)
+
+        if key & 0b111 == 0:
+            value, position = read_varint(data, position)
+        elif key & 0b111 == 1:
+            value, = struct.unpack_from('<d', data, position)
+            position += 8
+        elif key & 0b111 == 2:
+            size, position = read_varint(data, position)
+            value = data[position:position + size]
+            position += size
+
+        decoded.append((key >> 3, value))
+
+    return decoded
+
+
+def write_request(body: bytes) -> dict:
+    """Decode a WriteRequest into samples keyed by their sorted labels"""
+    series = {}
+
+    for _, ts in fields(unsnappy(body)):
+        labels, samples = [], []
+
+        for number, value in fields(ts):
+            if number == 1:
+                label = dict(fields(value))
+                labels.append((label[1].decode(), label[2].decode()))
+            elif number == 2:
+                sample = dict(fields(value))
+                samples.append((sample[2], sample[1]))
+
+        assert labels == sorted(labels)
+        series[tuple(labels)] = samples
+
+    return series
+
+
+class Sink(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, dict(self.headers), body))
+        status = self.server.statuses.pop(0) if self.server.statuses else 204
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def sink():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Sink)
+    server.requests, server.statuses = [], []
+    threading.Thread(
+        target=server.serve_forever, kwargs={'poll_interval': 0.01},
+        daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def registry(replaying):
+    registry = CollectorRegistry()
+    registry.register(replaying())
+    return registry
+
+
+def emitter(sink, registry, **kwargs) -> RemoteWriteEmitter:
+    return RemoteWriteEmitter(
+        f'http://127.0.0.1:{sink.server_port}/api/v1/write', registry,
+        instance='test', **kwargs)
+
+
+def test_samples_are_batched_with_timestamps(sink, registry):
+    e = emitter(sink, registry)
+    e.sample()
+    time.sleep(0.01)
+    e.sample()
+
+    assert e.flush() == 2
+    assert e.flush() == 0
+    assert len(sink.requests) == 1
+
+    path, headers, body = sink.requests[0]
+    assert path == '/api/v1/write'
+    assert headers['Content-Encoding'] == 'snappy'
+    assert headers['Content-Type'] == 'application/x-protobuf'
+    assert headers['X-Prometheus-Remote-Write-Version'] == '0.1.0'
+
+    series = write_request(body)
+    samples = series[(
+        ('__name__', 'zpool_iostat_size_bytes'), ('instance', 'test'),
+        ('job', 'zpool_iostat'), ('pool', 'tank'))]
+    assert [value for _, value in samples] == [1855425871872.0] * 2
+    assert samples[0][0] < samples[1][0]
+    assert all(len(s) == 2 for s in series.values())
+
+
+def test_samples_are_retried(sink, registry):
+    sink.statuses = [503]
+    e = emitter(sink, registry)
+    e.sample()
+
+    with pytest.raises(Exception, match='HTTP 503'):
+        e.flush()
+
+    e.sample()
+
+    assert e.flush() == 2
+    assert len(sink.requests) == 2
+
+    # The failed sample is sent again, ahead of the new sample
+    failed, retried = (write_request(body) for _, _, body in sink.requests)
+    assert failed.keys() == retried.keys()
+    assert all([t for t, _ in retried[labels]][:1] == [t for t, _ in samples]
+               for labels, samples in failed.items())
+
+
+def test_rejected_samples_are_discarded(sink, registry):
+    sink.statuses = [400]
+    e = emitter(sink, registry)
+    e.sample()
+
+    with pytest.raises(Exception, match='1 samples discarded'):
+        e.flush()
+
+    assert e.flush() == 0
+
+
+def test_queue_is_bounded(sink, registry):
+    e = emitter(sink, registry, capacity=2, batch_size=1)
+
+    for _ in range(3):
+        e.sample()
+        time.sleep(0.002)
+
+    assert e.dropped == 1
+    assert e.flush() == 1
+    assert e.flush() == 1
+    assert e.flush() == 0
+
+    timestamps = [
+        next(iter(write_request(body).values()))[0][0]
+        for _, _, body in sink.requests]
+    assert timestamps == sorted(timestamps)
+
+
+def test_flusher_sends_batches(sink, registry):
+    e = emitter(sink, registry, batch_size=5, flush_interval=0.5)
+    threading.Thread(target=e._flush, daemon=True).start()
+
+    for _ in range(12):
+        e.sample()
+
+    # Full batches are sent right away, the rest once the interval passed
+    deadline = time.monotonic() + 5
+
+    while len(sink.requests) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    time.sleep(0.1)
+    assert [len(next(iter(write_request(body).values())))
+            for _, _, body in sink.requests] == [5, 5, 2]
+
+
+def test_dropping_is_logged_once(sink, registry, caplog):
+    e = emitter(sink, registry, capacity=2)
+
+    for _ in range(5):
+        e.sample()
+
+    assert e.dropped == 3
+    assert len([r for r in caplog.records if 'falling behind' in r.message]) == 1
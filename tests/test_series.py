@@ -0,0 +1,69 @@
+import pytest
+from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client.core import HistogramMetricFamily
+from prometheus_client.parser import text_string_to_metric_families
+
+from prometheus_zpool_iostat_exporter import iostat
+
+LATENCY = 'zpool_iostat_latency_total_wait_read_seconds'
+
+
+def families(exporter) -> dict:
+    registry = CollectorRegistry()
+    registry.register(exporter)
+    exposition = generate_latest(registry).decode('utf-8')
+    return {family.name: family
+            for family in text_string_to_metric_families(exposition)}
+
+
+def dropped(families: dict) -> dict[str, float]:
+    return {s.labels['metric']: s.value
+            for s in families['zpool_iostat_dropped_series'].samples}
+
+
+def pools(families: dict, name: str) -> set[str]:
+    return {s.labels['pool'] for s in families[name].samples}
+
+
+def test_budget_drops_whole_pools(replaying):
+    e = replaying(max_series=40)
+    f = families(e)
+
+    # Latency histograms expose 37 buckets, +Inf, _count and _sum per pool
+    assert pools(f, LATENCY) == {'tank'}
+    assert len(f[LATENCY].samples) == 40
+    assert dropped(f)[LATENCY] == 40
+
+    # Gauges fit the budget with every pool
+    assert pools(f, 'zpool_iostat_size_bytes') == {'tank', 'backup'}
+    assert 'zpool_iostat_size_bytes' not in dropped(f)
+
+    # Every histogram keeps the pools that fit, and counts the others
+    for base, metrics in e.gather().items():
+        if base.family == HistogramMetricFamily:
+            exposed = pools(f, base.name)
+            assert len(f[base.name].samples) <= 40
+            assert dropped(f).get(base.name, 0) == sum(
+                m.series for m in metrics if m.pool not in exposed)
+
+
+@pytest.mark.parametrize('max_series', [10, 40])
+def test_budget_counts_sparse_series(replaying, max_series):
+    e = replaying(max_series=max_series, sparse_histograms=True)
+    f = families(e)
+    sparse = [m.sparse for m in e.gather()[iostat.LatencyTotalWaitRead]]
+    exposed = pools(f, LATENCY)
+
+    assert len(exposed) < 2
+    assert sum(m.series for m in sparse if m.pool in exposed) == len(
+        f[LATENCY].samples) <= max_series
+    assert dropped(f)[LATENCY] == sum(
+        m.series for m in sparse if m.pool not in exposed)
+    assert dropped(f)[LATENCY] < 40 * len(sparse)
+
+
+def test_dropped_series_require_a_budget(replaying):
+    f = families(replaying())
+
+    assert 'zpool_iostat_dropped_series' not in f
+    assert pools(f, LATENCY) == {'tank', 'backup'}
@@ -0,0 +1,89 @@
+import concurrent.futures
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from prometheus_zpool_iostat_exporter import exporter, iostat
+
+
+class Executor:
+    """Runs shards in this process, with the first `broken` pools broken"""
+    broken = 0
+    instances = []
+
+    def __init__(self, max_workers, mp_context):
+        self.shut_down = False
+        self.instances.append(self)
+
+    def submit(self, fn, *args):
+        future = Future()
+
+        if len(self.instances) <= self.broken:
+            future.set_exception(BrokenProcessPool('A worker died'))
+        else:
+            future.set_result(fn(*args))
+
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.fixture
+def shards(monkeypatch):
+    """Replace worker processes, returning the shards gathered by workers"""
+    shards = []
+
+    def gather_shard(pools, groups):
+        shards.append((pools, groups))
+        return {iostat.OperationsRead: [
+            iostat.OperationsRead(pool, 1) for pool in pools]}
+
+    Executor.broken, Executor.instances = 0, []
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', Executor)
+    monkeypatch.setattr(exporter, 'gather_shard', gather_shard)
+    return shards
+
+
+def test_pools_are_taken_from_list_group(replaying, commands, shards):
+    data = replaying(workers=2).gather_sharded(['list', 'iostat'])
+
+    assert ['zpool', 'list', '-H', '-o', 'name'] not in commands
+    assert shards == [(['tank'], ['iostat']), (['backup'], ['iostat'])]
+    assert [m.pool for m in data[iostat.Size]] == ['tank', 'backup']
+    assert [m.pool for m in data[iostat.OperationsRead]] == ['tank', 'backup']
+
+
+def test_pools_are_listed_without_list_group(replaying, commands, shards):
+    replaying(workers=2).gather_sharded(['iostat'])
+
+    assert commands == [['zpool', 'list', '-H', '-o', 'name']]
+    assert shards == [(['tank'], ['iostat']), (['backup'], ['iostat'])]
+
+
+def test_broken_pool_is_replaced(replaying, shards):
+    Executor.broken = 1
+    e = replaying(workers=2)
+    data = e.gather_sharded(['iostat'])
+
+    assert len(data[iostat.OperationsRead]) == 2
+    assert [executor.shut_down for executor in Executor.instances] == [
+        True, False]
+
+    # The replacement pool is reused by later collections
+    e.gather_sharded(['iostat'])
+    assert len(Executor.instances) == 2
+
+
+def test_broken_pool_is_raised_after_retry(replaying, shards):
+    Executor.broken = 2
+    e = replaying(workers=2)
+
+    with pytest.raises(BrokenProcessPool):
+        e.gather_sharded(['iostat'])
+
+    # The next collection starts with a new pool
+    data = e.gather_sharded(['iostat'])
+    assert len(data[iostat.OperationsRead]) == 2
+    assert len(Executor.instances) == 3
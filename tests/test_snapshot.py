@@ -0,0 +1,34 @@
+import json
+
+from prometheus_zpool_iostat_exporter.snapshot import (
+    SnapshotReader, SnapshotWriter, HEADER)
+
+
+def reject(constant):
+    raise ValueError(f'{constant} is not valid JSON')
+
+
+def test_snapshot_is_valid_json(replaying, tmp_path):
+    path = tmp_path / 'zpool_iostat.snapshot'
+    writer = SnapshotWriter(path)
+    list(replaying(snapshot_writer=writer).collect())
+
+    reader = SnapshotReader(path)
+    snapshot = reader.read()
+    metrics = snapshot['metrics']
+
+    # '-' cells in the zpool output are published as null
+    assert metrics['zpool_iostat_checkpoint_bytes'] == {
+        'tank': None, 'backup': None}
+    assert metrics['zpool_iostat_trim_seconds']['tank'] is None
+    assert metrics['zpool_iostat_size_bytes']['tank'] == 1855425871872.0
+    assert len(metrics['zpool_iostat_latency_total_wait_read_seconds'][
+        'tank']['counts']) == 37
+
+    # Strict parsers, unlike Python's json module, reject NaN
+    payload = path.read_bytes()[HEADER.size:]
+    json.loads(
+        payload.rstrip(b'\0').decode('utf-8'), parse_constant=reject)
+
+    reader.close()
+    writer.close()
@@ -0,0 +1,83 @@
+import os
+import stat
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from prometheus_zpool_iostat_exporter.textfile import TextfileWriter
+
+
+@pytest.fixture
+def writer(replaying, tmp_path) -> TextfileWriter:
+    registry = CollectorRegistry()
+    registry.register(replaying())
+    return TextfileWriter(tmp_path / 'zpool_iostat.prom', registry)
+
+
+@pytest.fixture
+def calls(monkeypatch) -> list[str]:
+    """Record calls to os.replace and os.utime"""
+    calls, replace, utime = [], os.replace, os.utime
+
+    def recording_replace(*args, **kwargs):
+        calls.append('replace')
+        return replace(*args, **kwargs)
+
+    def recording_utime(*args, **kwargs):
+        calls.append('utime')
+        return utime(*args, **kwargs)
+
+    monkeypatch.setattr(os, 'replace', recording_replace)
+    monkeypatch.setattr(os, 'utime', recording_utime)
+    return calls
+
+
+def test_file_is_replaced(writer, tmp_path):
+    old = tmp_path / 'zpool_iostat.prom'
+    old.write_text('stale\n')
+    os.chmod(old, 0o600)
+    inode = os.stat(old).st_ino
+
+    writer.write()
+
+    # The file is a new one, renamed into place, rather than rewritten
+    assert os.stat(writer.path).st_ino != inode
+    assert stat.S_IMODE(os.stat(writer.path).st_mode) == 0o644
+    assert 'zpool_iostat_size_bytes{pool="tank"}' in old.read_text()
+    assert os.listdir(tmp_path) == ['zpool_iostat.prom']
+
+
+def test_failed_write_leaves_no_temporary_file(writer, tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(os, 'replace', fail)
+
+    with pytest.raises(OSError, match='No space left'):
+        writer.write()
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_unchanged_file_is_touched(writer, calls):
+    writer.write()
+    inode = os.stat(writer.path).st_ino
+    os.utime(writer.path, (0, 0))
+    calls.clear()
+
+    writer.write()
+
+    assert calls == ['utime']
+    assert os.stat(writer.path).st_ino == inode
+    assert os.stat(writer.path).st_mtime > 0
+
+
+def test_deleted_file_is_rewritten(writer, calls):
+    writer.write()
+    os.unlink(writer.path)
+    calls.clear()
+
+    writer.write()
+
+    assert calls == ['replace']
+    assert 'zpool_iostat_size_bytes' in open(writer.path).read()